@@ -1,9 +1,10 @@
 # api_contexts/discord_api.py
-import traceback
+import io
+import itertools
 
 import discord
 from datetime import datetime
-from typing import Optional, List, Union, Dict, Any
+from typing import Optional, List, Union, Dict, Any, Set
 
 import cinAPI
 import cinIO
@@ -12,6 +13,8 @@ from cinPalette import *
 
 CLIENT_NAME = "discord"
 
+logger = cinLogging.getLogger(__name__)
+
 
 # ---------- ADAPTER OBJECTS ----------
 
@@ -32,7 +35,7 @@ class DiscordUser:
                     await self._u.send(part)
 
         except Exception as e:
-            print(f"Failed to send DM: {e}")
+            logger.error("Failed to send DM: %s", e)
             raise
 
     @property
@@ -70,16 +73,12 @@ class DiscordChannel:
 
     async def send(self, content: str, *args, **kwargs) -> None: # todo: DRY
         """Send message with automatic splitting for Discord limits"""
-        debug_send_function = True
-
-        if debug_send_function: print("starting to send message while debug_send_function is true")
         try:
             # Handle both regular messages and embeds/files
             parts = cinAPI.split_message(content)
 
             for i, part in enumerate(parts):
-                if debug_send_function:
-                    print(f"part {i+1} of {len(parts)}: '{part}'")
+                logger.debug("sending part %d of %d to channel %s", i + 1, len(parts), self._id)
 
                 if i == 0:
                     # First part gets all original args/kwargs
@@ -89,16 +88,27 @@ class DiscordChannel:
                     await self._c.send(part)
 
         except Exception as e:
-            print(f"Failed to send message: {e}")
+            logger.error("Failed to send message: %s", e)
             # Re-raise to allow higher-level error handling
             raise
 
-        if debug_send_function: print("finished sending message while debug_send_function is true")
+    async def send_file(self, content: str, filename: str, data: bytes) -> None:
+        """Send a message with data attached as a file"""
+        try:
+            await self._c.send(content, file=discord.File(io.BytesIO(data), filename=filename))
+        except Exception as e:
+            logger.error("Failed to send file: %s", e)
+            raise
 
     @property
     def id(self) -> int:
         return self._id
 
+    @property
+    def guild(self) -> Optional["DiscordGuild"]:
+        guild = getattr(self._c, "guild", None)
+        return DiscordGuild(guild) if guild else None
+
     @property
     def name(self) -> str:
         if self._cached_name:
@@ -140,6 +150,17 @@ class DiscordGuild:
     def name(self) -> str:
         return self._g.name
 
+    def readable_channel_ids(self, user_id: int) -> Set[int]:
+        member = self._g.get_member(user_id)
+        if member is None:
+            return set()
+        readable = set()
+        for channel in itertools.chain(self._g.channels, self._g.threads):
+            permissions = channel.permissions_for(member)
+            if permissions.read_messages and permissions.read_message_history:
+                readable.add(channel.id)
+        return readable
+
 
 class DiscordMessage:
     def __init__(self, msg: discord.Message):
@@ -164,7 +185,7 @@ class DiscordMessage:
         try:
             await self.channel.send(reply_text)
         except discord.HTTPException as e2:
-            print(f"Failed to send message: {e2}")
+            logger.error("Failed to send message: %s", e2)
 
 
 class DiscordReaction:
@@ -178,7 +199,13 @@ class DiscordAPIClient(cinAPI.InternalEventDispatchMixin, discord.Client):
 
     def __init__(self, name: str, **kwargs):
         # Initialize the mixin
-        cinAPI.InternalEventDispatchMixin.__init__(self, name)
+        queueConfig = cinIO.config.get("eventQueue", {})
+        cinAPI.InternalEventDispatchMixin.__init__(
+            self, name,
+            event_workers=queueConfig.get("workers", 4),
+            event_queue_size=queueConfig.get("size", 1000),
+            event_queue_policy=queueConfig.get("policy", "block")
+        )
 
         # Set up discord.py client
         intents = discord.Intents.default()
@@ -216,14 +243,14 @@ class DiscordAPIClient(cinAPI.InternalEventDispatchMixin, discord.Client):
         return None
 
     async def _setup_event_handlers(self) -> None:
-        print("DiscordAPIClient setting up event handlers")
+        logger.debug("DiscordAPIClient setting up event handlers")
         """Set up discord.py event handlers"""
         await super()._setup_event_handlers()
-        print("DiscordAPIClient event handlers set up")
+        logger.debug("DiscordAPIClient event handlers set up")
 
         # Setup discord.py event handlers
         self._setup_task = self.loop.create_task(self._setup_discord_handlers())
-        print("DiscordAPIClient event handlers setup task created")
+        logger.debug("DiscordAPIClient event handlers setup task created")
 
     async def _setup_discord_handlers(self) -> None:
         """Setup discord.py event handlers after client is ready"""
@@ -232,7 +259,7 @@ class DiscordAPIClient(cinAPI.InternalEventDispatchMixin, discord.Client):
 
     async def on_ready(self) -> None:
         """Discord.py ready event handler"""
-        print(f'Discord client "{self.name}" logged in as {self.user}')
+        logger.info('Discord client "%s" logged in as %s', self.name, self.user)
         await self._on_internal_ready()
 
     async def on_message(self, message: discord.Message) -> None:
@@ -262,11 +289,11 @@ class DiscordAPIClient(cinAPI.InternalEventDispatchMixin, discord.Client):
 
         # Check if client is ready and WebSocket is connected
         if not self.is_ready():
-            print(f"  Warning: Client not ready yet, postponing presence update")
+            logger.warning("Client not ready yet, postponing presence update")
             return
 
         if self.ws is None or not self.ws.open:
-            print(f"  Warning: WebSocket not connected, postponing presence update")
+            logger.warning("WebSocket not connected, postponing presence update")
             return
 
         # Convert status string to discord.Status enum
@@ -300,29 +327,27 @@ class DiscordAPIClient(cinAPI.InternalEventDispatchMixin, discord.Client):
 
             cinLogging.printInBox(f"status updated at {thisHour}:{thisMinute}{amOrPm}", debugColor, 4, 8, 120, color=debugColor)
         except Exception as e:
-            print(f"Failed to set presence: {e}")
-            traceback.print_exc()
             # Don't exit - just log the error and continue
-            print(f"  Non-fatal error, continuing...")
+            logger.exception("Failed to set presence (non-fatal, continuing): %s", e)
 
         # Optionally call super if the mixin has its own handling
         await super().set_presence(activity=activity, status=status)
 
     async def start_client(self) -> None:
         """Start the discord client - non-blocking version"""
-        print(f"Starting DiscordAPIClient '{self.name}'...")
+        logger.info("Starting DiscordAPIClient '%s'...", self.name)
 
         try:
             # This is the correct way to start a discord.py client
             await self.login(cinIO.token)
             await self.connect()
         except Exception as e:
-            print(f"Discord client '{self.name}' failed to start: {e}")
-            traceback.print_exc()
+            logger.exception("Discord client '%s' failed to start: %s", self.name, e)
             raise
 
     async def stop_client(self) -> None:
         """Stop the discord client"""
+        self._stop_event_workers()
         if not self.is_closed():
             await self.close()
 
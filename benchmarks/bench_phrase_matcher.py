@@ -0,0 +1,56 @@
+# benchmarks/bench_phrase_matcher.py
+# per-message cost of phrase matching as the number of bound phrases grows.
+# run from the repo root: python -m benchmarks.bench_phrase_matcher
+import random
+import string
+import timeit
+
+from cinMatcher import PhraseMatcher
+
+PHRASE_COUNTS = [10, 100, 1000, 10000]
+MESSAGE_COUNT = 200
+REPEATS = 5
+
+
+def make_phrases(count: int, rng: random.Random) -> dict:
+    phrases = {"*": lambda: None}
+    while len(phrases) < count + 1:
+        word = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12)))
+        phrases[word] = lambda: None
+    return phrases
+
+
+def make_messages(rng: random.Random) -> list:
+    alphabet = string.ascii_lowercase + "     ,.!?"
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(20, 300))) for _ in range(MESSAGE_COUNT)]
+
+
+def naive_first_match(phrases: dict, text: str):
+    # what handlePrompts used to do
+    for phrase, func in phrases.items():
+        if phrase in text:
+            return func
+    return None
+
+
+def per_message_us(fn, messages) -> float:
+    best = min(timeit.repeat(lambda: [fn(m) for m in messages], number=1, repeat=REPEATS))
+    return best / len(messages) * 1e6
+
+
+def main():
+    rng = random.Random(4)
+    messages = make_messages(rng)
+
+    print(f"{'phrases':>8} | {'matcher us/msg':>14} | {'naive us/msg':>12}")
+    print(f"{'-' * 8}-+-{'-' * 14}-+-{'-' * 12}")
+    for count in PHRASE_COUNTS:
+        phrases = make_phrases(count, rng)
+        matcher = PhraseMatcher(phrases)
+        matcherCost = per_message_us(matcher.first_match, messages)
+        naiveCost = per_message_us(lambda m: naive_first_match(phrases, m), messages)
+        print(f"{count:>8} | {matcherCost:>14.2f} | {naiveCost:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# benchmarks/bench_print_in_box.py
+# cost of boxing long chat messages with printInBox, against the old char-by-char renderer.
+# run from the repo root: python -m benchmarks.bench_print_in_box
+import contextlib
+import io
+import random
+import string
+import timeit
+
+import cinLogging
+from cinPalette import LARGE_WINDOW, clearFormatting, defaultColor, highlightedColor, indent
+
+MESSAGE_SIZES = [500, 2000, 8000]
+MESSAGE_COUNT = 20
+REPEATS = 5
+
+
+# the renderer as it was, for comparison
+
+def _step_escape(char: str, in_escape: bool) -> tuple[bool, bool]:
+    """
+    Process a single character for ANSI escapes.
+    Returns (is_visible, new_in_escape).
+    """
+    if in_escape:
+        return False, char != 'm'
+
+    if char == '\033':
+        return False, True
+
+    return True, False
+
+
+def _process_escape_sequences(chars: list, start_index: int = 0, track_last_space: bool = False) -> tuple[int, bool, int]:
+    visible_count = 0
+    in_escape = False
+    last_space = -1
+
+    for i in range(start_index, len(chars)):
+        char = chars[i]
+        is_visible, in_escape = _step_escape(char, in_escape)
+
+        if not is_visible:
+            continue
+
+        if track_last_space and char == ' ':
+            last_space = i
+
+        visible_count += 1
+
+    return visible_count, in_escape, last_space
+
+
+
+def _get_visible_width(text: str) -> int:
+    """Calculate the visible width of text, ignoring ANSI escape sequences."""
+    visible_count, _, _ = _process_escape_sequences(list(text))
+    return visible_count
+
+def legacy_print_in_box(text: str, boxColor: str, boxIndentation: int = 1, indentation: int = 1, width: int = 40,
+               color: str = defaultColor, altFirstBorder: bool = False):
+    if text is None:
+        raise ValueError("Text cannot be None")
+    if width < 1:
+        raise ValueError("Width must be positive")
+    if boxIndentation < 0 or indentation < 0:
+        raise ValueError("Indentation values must be non-negative")
+
+    # constants
+    BORDER_ALT = "| |"
+    BORDER_NORMAL = "||"
+    firstBorder = BORDER_ALT if altFirstBorder else BORDER_NORMAL
+    box_indent = indent * boxIndentation
+    inner_indent = indent * indentation
+
+    # cleanup
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+    # setup
+    usable_width = width - len(inner_indent)
+
+    current_line = []
+    lines = []
+    current_pos = 0
+    text_length = len(text)
+
+    in_escape = False
+    visible_count = 0
+
+    while current_pos < text_length:
+        char = text[current_pos]
+        if char == '\n': # immediately break on newline
+            line = ''.join(current_line)
+            lines.append(line)
+            current_line = []
+            visible_count = 0
+            current_pos += 1
+            continue
+        # not on newline
+
+        # escape sequences (very redundant redundancy is redundant)
+        if in_escape:
+            current_line.append(char)
+            if char == 'm':
+                in_escape = False
+            current_pos += 1
+            continue
+        if char == '\033':
+            in_escape = True
+            current_line.append(char)
+            current_pos += 1
+            continue
+        # not on newline or in escape sequence: count char as visible
+        current_line.append(char)
+        visible_count += 1
+
+        if visible_count >= usable_width:
+            # visible width exceeded, break line
+            # look for last space in visible characters using helper
+            visible_chars, _, last_space = _process_escape_sequences(current_line, track_last_space=True)
+
+            # if we found a space within usable width, split the line at that point
+            if last_space != -1:
+                line = ''.join(current_line[:last_space])
+                lines.append(line)
+                remaining = current_line[last_space + 1:]
+                current_line = []
+
+                # recalculate visible count for remaining line using helper
+                visible_count, _ = _process_escape_sequences(remaining)[:2]
+                current_line = remaining
+
+                # Adjust position to account for characters we're keeping
+                current_pos = current_pos - (len(current_line) - visible_count)
+            else:  # otherwise, ya yeet
+                line = ''.join(current_line)
+                lines.append(line)
+                current_line = []
+                visible_count = 0
+        # step
+        current_pos += 1
+
+    if current_line:
+        lines.append(''.join(current_line))
+
+    # Print with proper padding
+    for line in lines:
+        visible_width = _get_visible_width(line)
+        padding_needed = usable_width - visible_width
+        if padding_needed > 0:
+            padding = " " * padding_needed
+            print(
+                f"{box_indent}{boxColor}{firstBorder}{inner_indent}{color}{line}{padding}{indent * 2}{boxColor}|{clearFormatting}")
+        else:
+            print(
+                f"{box_indent}{boxColor}{firstBorder}{inner_indent}{color}{line}{indent * 2}{boxColor}|{clearFormatting}")
+
+
+def make_message(size: int, rng: random.Random) -> str:
+    """a chat message the way printHumanMessage boxes it: colored header line, then the raw content"""
+    words = []
+    length = 0
+    while length < size:
+        word = "".join(rng.choice(string.ascii_letters) for _ in range(rng.randint(1, 12)))
+        roll = rng.random()
+        if roll < 0.03:
+            word += "\n"
+        elif roll < 0.04:
+            word = "x" * rng.randint(40, 120)  # pasted link, no spaces to break on
+        words.append(word)
+        length += len(word) + 1
+    return f"{highlightedColor}    someone:{defaultColor} \n" + " ".join(words)
+
+
+def capture(func, *args) -> str:
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        func(*args)
+    return out.getvalue()
+
+
+def run_legacy(messages):
+    for message in messages:
+        legacy_print_in_box(message, LARGE_WINDOW.box_color, LARGE_WINDOW.box_indentation, LARGE_WINDOW.indentation,
+                            LARGE_WINDOW.width, LARGE_WINDOW.text_color, LARGE_WINDOW.alt_first_border)
+
+
+def run_current(messages):
+    cinLogging.renderBox.cache_clear()  # measure rendering, not the cache
+    for message in messages:
+        cinLogging.printInBoxP(message, LARGE_WINDOW)
+
+
+def main():
+    rng = random.Random(1)
+    print(f"{'chars':>6} {'legacy':>12} {'current':>12} {'speedup':>8}")
+    for size in MESSAGE_SIZES:
+        messages = [make_message(size, rng) for _ in range(MESSAGE_COUNT)]
+        for message in messages:
+            assert capture(run_legacy, [message]) == capture(run_current, [message])
+
+        sink = io.StringIO()
+        with contextlib.redirect_stdout(sink):
+            legacy = min(timeit.repeat(lambda: run_legacy(messages), number=1, repeat=REPEATS)) / MESSAGE_COUNT
+            current = min(timeit.repeat(lambda: run_current(messages), number=1, repeat=REPEATS)) / MESSAGE_COUNT
+        print(f"{size:>6} {legacy * 1e3:>10.3f}ms {current * 1e3:>10.3f}ms {legacy / current:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -106,6 +106,14 @@ debugSettings = {
     "doReminders": True
 }
 
+def configureDispatch():
+    dispatchConfig = config.get("dispatch", {})
+    cinAPI.configure_dispatch(
+        concurrent=dispatchConfig.get("concurrent", False),
+        handler_timeout=dispatchConfig.get("handlerTimeout", 0),
+        order=dispatchConfig.get("order", "global_first")
+    )
+
 def hardCodedClientImport(): # todo: replace with discovery in api_contexts, similar to how plugins are loaded
     import api_contexts.discord_api
     api_contexts.discord_api.make_client("discord")
@@ -113,6 +121,7 @@ def hardCodedClientImport(): # todo: replace with discovery in api_contexts, sim
 # !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[DEFINITIONS & IMPORTS]
 
 import os.path
+import sys
 import traceback
 import time
 from datetime import datetime
@@ -124,9 +133,15 @@ from typing import Dict, Callable, get_type_hints
 
 import cinAPI
 import cinLogging
+import cinMatcher
+import cinMetrics
+import cinProfiler
+import cinWatchdog
 from cinLogging import printHighlighted, printDefault, printLabelWithInfo, printErr
 from cinPalette import *
 
+logger = cinLogging.getLogger(__name__)
+
 # todo: log matches to handlers
 
 # !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[GLOBAL STATE]
@@ -136,6 +151,9 @@ phrases: Dict[str, Callable] = {}
 reactionhandlers: Dict[str, Callable] = {}
 loopfunctions = []
 
+phraseMatcher = cinMatcher.PhraseMatcher()
+commandTable = cinMatcher.CommandTable(config["prefix"])
+
 playlistURLs = []
 initTime = datetime.now().replace(microsecond=0)
 initTimeSession = datetime.now().replace(microsecond=0)
@@ -173,23 +191,18 @@ def validate_handler(fn, expected_args: int, name: str, expected_types: list = N
 
 # !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[MESSAGE HANDLERS]
 
-async def handlePrompts(message: cinAPI.APIMessage, messageContent: str):
-    global phrases
+def rebuildDispatchTables():
+    # call whenever commands or phrases change- handleCommand and handlePrompts only ever look at the compiled versions
+    commandTable.rebuild(commands)
+    phraseMatcher.rebuild(phrases)
 
-    for phrase, func in phrases.items():
-        if phrase == "*":
-            try:
-                await func(message)
-            except Exception as e:
-                printErr(f"err in {func}: {e}")
-
-    for phrase, func in phrases.items():
-        if phrase in messageContent:
-            try:
-                await func(message)
-            except Exception as e:
-                printErr(f"err in {func}: {e}")
-            return
+async def handlePrompts(message: cinAPI.APIMessage, messageContent: str):
+    # each plugin's handler is its own handler call: timed out, isolated and concurrent as dispatch is configured
+    handlers = list(phraseMatcher.wildcards)
+    match = phraseMatcher.first_match(messageContent)
+    if match is not None:
+        handlers.append(match[1])
+    await cinAPI.run_handlers("phrase", handlers, message)
 
 async def handleRegularMessage(message: cinAPI.APIMessage):
     global Nope
@@ -211,30 +224,22 @@ async def handleRegularMessage(message: cinAPI.APIMessage):
             Nope = 0
 
 async def handleCommand(message: cinAPI.APIMessage):
-    global commands
     if message.author.bot:
         return
 
-    messageContent = message.content
-    words = messageContent.lower().split(" ")
-
-    printLabelWithInfo(time.strftime('%a, %d %b %Y %H:%M:%S +0000', time.gmtime()))
-    printLabelWithInfo(f"  !!>{message.author.display_name}", messageContent)
-
-    message_command = words[0][len(bot_prefix):]
-
-    if message_command not in commands:
+    match = commandTable.lookup(message.content)
+    if match is None:
         return
+    message_command, func = match
 
-    try:
-        await commands[message_command](message)
-    except Exception as e:
-        printErr(f"Command '{message_command}' failed:")
-        printErr(f"  Error: {e}")
-        printErr("  Full traceback:")
-        printErr(traceback.format_exc())
+    logger.debug("!!>%s: %s", message.author.display_name, message.content)
+
+    [error] = await cinAPI.run_handlers("command", [func], message)  # logged there, with the traceback
+    if isinstance(error, asyncio.TimeoutError):
+        await message.channel.send(f"❌ Command timed out: `{message_command}`")
+    elif error is not None:
         await message.channel.send(
-            f"❌ Command failed: `{message_command}`\n```{type(e).__name__}: {e}```"
+            f"❌ Command failed: `{message_command}`\n```{type(error).__name__}: {error}```"
         )
 
 # !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[STATUS]
@@ -281,6 +286,7 @@ async def on_ready(client: cinAPI.APIClient):
     printDefault(fiveLines)
 
 @cinAPI.register_message_handler
+@cinAPI.fans_out
 async def on_message(message: cinAPI.APIMessage):
     # traceback.print_stack()
     if message.content.startswith(bot_prefix):
@@ -289,6 +295,7 @@ async def on_message(message: cinAPI.APIMessage):
         await handleRegularMessage(message)
 
 @cinAPI.register_reaction_handler
+@cinAPI.fans_out
 async def on_reaction(reaction: cinAPI.APIReaction, user: cinAPI.APIUser):
     if user.bot:
         return
@@ -299,10 +306,7 @@ async def on_reaction(reaction: cinAPI.APIReaction, user: cinAPI.APIUser):
     lowerContent = message.content.lower()
     for phrase, func in reactionhandlers.items():
         if phrase in lowerContent:
-            try:
-                await func(reaction, user)
-            except Exception as e:
-                printErr(f"err in {func}: {e}")
+            await cinAPI.run_handlers("reaction", [func], reaction, user)
             return
 
 # !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[LOOP]
@@ -314,12 +318,15 @@ async def loop():
     global lastStatusUpdateTime
     #print("loop started!")
     while True:  # Add a loop to run continuously
+        tickStart = time.perf_counter()
         try:
             #print("yo")
             #print(f"loop functions: {loopfunctions}")
             if time.time() - lastStatusUpdateTime > (60 - loopDelay / 2):
                 await handleStatusUpdate()
 
+            cinIO.userDataStore.flushIfDue()
+
             for func in loopfunctions:
                 #print(func)
                 try:
@@ -329,6 +336,7 @@ async def loop():
         except Exception as e:
             printErr(f"err in loop: {e}")
             traceback.print_exc()
+        cinMetrics.registry.loopTick.observe(time.perf_counter() - tickStart)
 
         await asyncio.sleep(loopDelay)  # Wait before next iteration
 
@@ -358,7 +366,7 @@ def load_dictionary_component(
                 arg_count, desc, arg_types = validation_args
                 desc_formatted = desc.format(name=name)
                 validation_func(fn, arg_count, desc_formatted, arg_types)
-                storage[name] = fn
+                storage[name] = cinMetrics.registry.wrap(component_type, name, plugin_dir.name, fn)
                 success += 1
             except Exception as e:
                 cinLogging.printInBoxP(
@@ -402,7 +410,10 @@ def load_plugins():
             continue
 
         module_name = f"plugins.{plugin_dir.name}"
-        spec = importlib.util.spec_from_file_location(module_name, init_file)
+        # registered as a package under its real name, so a plugin's own submodules (plugins.<name>.whatever)
+        # resolve to this module instead of importing a second copy of it
+        spec = importlib.util.spec_from_file_location(module_name, init_file,
+                                                      submodule_search_locations=[str(plugin_dir)])
         if spec is None:
             printErr(f"Failed to create spec for plugin {plugin_dir}")
             cinLogging.printBoxBorderP(LARGE_WINDOW)
@@ -410,8 +421,10 @@ def load_plugins():
 
         try:
             module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module
             spec.loader.exec_module(module)  # type: ignore
         except Exception as e:
+            sys.modules.pop(module_name, None)
             printErr(f"Failed to import plugin {plugin_dir}: {e}")
             cinLogging.printBoxBorderP(LARGE_WINDOW)
             continue
@@ -445,7 +458,7 @@ def load_plugins():
                 loopy = module.bind_loop()
                 try:
                     validate_handler(loopy, 0, "loop function")
-                    loopfunctions.append(loopy)
+                    loopfunctions.append(cinMetrics.registry.wrap("loops", loopy.__name__, plugin_dir.name, loopy))
                 except Exception as e:
                     success = 0
                     cinLogging.printInBoxP(f"Failed to load loop function:\n   {e}", ERROR_BOX)
@@ -472,8 +485,11 @@ def load_plugins():
 
         cinLogging.printBoxBorderP(LARGE_WINDOW_BORDER)
 
+    rebuildDispatchTables()
+
 async def main():
     os.system("color")
+    cinLogging.startConsole()
     cinLogging.printBoxBorder(0, 130, debugColor)
     print("      bot starting...")
     load_plugins()
@@ -498,6 +514,9 @@ async def main():
     cinLogging.printInBoxP(f" Initializing clients...", LARGE_WINDOW_HEADER)
     cinLogging.printBoxBorderP(LARGE_WINDOW_BORDER)
 
+    configureDispatch()
+    await cinMetrics.startMetricsServer()
+    cinWatchdog.startWatchdog()
     hardCodedClientImport()
 
     # Get all registered clients
@@ -515,11 +534,12 @@ async def main():
     print()
 
     # wait for all tasks and loop
-    print(f"starting loop every {loopDelay} seconds, {len(loopfunctions)} loop functions: {loopfunctions}")
+    logger.info("starting loop every %s seconds, %d loop functions: %s", loopDelay, len(loopfunctions), loopfunctions)
     # loop loop every loopDelay seconds
     loop_task = asyncio.create_task(loop(), name="loop_task")
-    print(loop_task)
+    logger.debug("%s", loop_task)
     tasks.append(loop_task)
+    tasks.append(asyncio.create_task(cinProfiler.profileOnStartup(), name="startup_profile"))
 
     await asyncio.gather(*tasks, return_exceptions=True)
 
@@ -1,6 +1,10 @@
 # cinAPI.py
+import asyncio
+import itertools
+import time
+from collections import deque
 from datetime import datetime
-from typing import List, Dict, Callable, Awaitable, Literal, Optional, Any, Protocol
+from typing import List, Dict, Callable, Awaitable, Literal, Optional, Any, Protocol, Iterable, Iterator, Set, Deque
 import logging
 from cinPalette import LARGE_WINDOW
 
@@ -20,13 +24,20 @@ class APIGuild(Protocol):
     id: int
     name: str
 
+    def readable_channel_ids(self, user_id: int) -> Set[int]:
+        """ids of the channels (and threads) whose history user_id can read. empty if they aren't a member"""
+        ...
+
 class APIChannel(Protocol):
     id: int
     name: str
     client_name: str
+    guild: Optional[APIGuild]  # None for DMs
 
     async def send(self, content: str) -> None: ...
 
+    async def send_file(self, content: str, filename: str, data: bytes) -> None: ...
+
 class APIMessage(Protocol):
     content: str
     author: APIUser
@@ -86,7 +97,7 @@ def split_message(content: str, limit: int = 2000) -> list[str]:
     if len(content) <= limit:
         return [content]
 
-    print(f"splitting message! original: '''{content}'''")
+    logger.debug("splitting %d character message", len(content))
 
     parts = []
     while content:
@@ -110,6 +121,94 @@ def split_message(content: str, limit: int = 2000) -> list[str]:
 
     return parts
 
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[ pagination
+
+class SendRateLimiter:
+    """
+    Per-channel send pacing (GCRA): up to burst messages at once, then one every 1 / per_second seconds.
+    Waiting is an asyncio.sleep, so a long listing never holds up other handlers
+    """
+
+    def __init__(self, per_second: float = 1.0, burst: int = 5):
+        self.interval = 1 / per_second
+        self.tolerance = (burst - 1) * self.interval
+        self._next: Dict[tuple, float] = {}  # {(client, channel id): theoretical arrival time}
+
+    async def wait(self, channel: APIChannel):
+        key = (getattr(channel, "client_name", None), channel.id)
+        now = time.monotonic()
+        arrival = max(self._next.get(key, now), now)
+        allowed_at = arrival - self.tolerance
+        self._next[key] = arrival + self.interval  # reserved before sleeping, so concurrent senders queue up
+        if allowed_at > now:
+            await asyncio.sleep(allowed_at - now)
+
+
+send_rate_limiter = SendRateLimiter()
+
+
+def paginate(blocks: Iterable[str], limit: int = 1900, fence: str = "") -> Iterator[str]:
+    """
+    Pack blocks into pages of at most limit characters, lazily: a page is built only when it's asked for.
+    Each block is wrapped in fence (e.g. "```"); a block too long for one page is split across several
+    """
+    page = []
+    page_length = 0
+    for block in blocks:
+        for part in split_message(block, limit - 2 * len(fence) - 1):
+            part = f"{fence}{part}{fence}"
+            if page and page_length + len(part) + 1 > limit:
+                yield "\n".join(page)
+                page = []
+                page_length = 0
+            page.append(part)
+            page_length += len(part) + 1
+    if page:
+        yield "\n".join(page)
+
+
+async def send_paginated(channel: APIChannel, blocks: Iterable[str], limit: int = 1900, fence: str = "",
+                         attach_over_pages: int = 0, filename: str = "listing.txt",
+                         rate_limiter: Optional[SendRateLimiter] = None) -> int:
+    """
+    Send blocks as pages (see paginate), paced by rate_limiter. If attach_over_pages is set and the listing
+    runs past that many pages, it's uploaded as a single text file instead, when the channel can send files.
+    Returns the number of messages sent.
+    """
+    rate_limiter = rate_limiter or send_rate_limiter
+    blocks = iter(blocks)
+
+    if attach_over_pages and hasattr(channel, "send_file"):
+        consumed = []
+
+        def recording():
+            for block in blocks:
+                consumed.append(block)
+                yield block
+
+        pages = paginate(recording(), limit, fence)
+        buffered = []
+        for page in pages:
+            buffered.append(page)
+            if len(buffered) > attach_over_pages:
+                # everything pulled so far, plus whatever paginate hasn't gotten to yet
+                text = "\n\n".join(itertools.chain(consumed, blocks))
+                logger.debug("listing is over %d pages, attaching %s instead", attach_over_pages, filename)
+                await rate_limiter.wait(channel)
+                await channel.send_file(f"Listing is over {attach_over_pages} pages, attached as {filename}",
+                                        filename, text.encode("utf-8"))
+                return 1
+        pages = buffered
+    else:
+        pages = paginate(blocks, limit, fence)
+
+    sent = 0
+    for page in pages:
+        await rate_limiter.wait(channel)
+        await channel.send(page)
+        sent += 1
+    return sent
+
 # Registry for multiple clients
 class ClientRegistry:
     """Manages multiple API client instances"""
@@ -121,12 +220,12 @@ class ClientRegistry:
     def register(self, name: str, client: APIClient, set_as_default: bool = False):
         """Register a new client instance"""
         if name in self._clients:
-            logger.warning(f"Client '{name}' is already registered. Overwriting.")
+            logger.warning("Client '%s' is already registered. Overwriting.", name)
 
         self._clients[name] = client
         if set_as_default or self._default_client is None:
             self._default_client = name
-        logger.debug(f"Registered client '{name}'")
+        logger.debug("Registered client '%s'", name)
 
     def get(self, name: Optional[str] = None) -> APIClient:
         """Get a client by name, or the default client"""
@@ -140,6 +239,28 @@ class ClientRegistry:
         return self._clients.copy()
 
 
+HandlerOutcome = Literal["ok", "error", "timeout"]
+# (event type, handler_name, seconds, outcome) for every handler call. cinMetrics installs one
+HandlerObserver = Callable[[str, str, float, HandlerOutcome], None]
+
+
+def handler_name(handler: Callable) -> str:
+    """module.qualname for a handler, used as its stats key"""
+    return f"{getattr(handler, '__module__', '?')}.{getattr(handler, '__qualname__', repr(handler))}"
+
+
+def fans_out(handler: Callable) -> Callable:
+    """mark an event handler that passes the event on to others through run_handlers(), which times each of those"""
+    handler.cinapi_fans_out = True
+    return handler
+
+
+def is_fan_out(handler: Callable) -> bool:
+    return getattr(handler, "cinapi_fans_out", False)
+
+
+HandlerOrder = Literal["global_first", "client_first"]
+
 # Event handling system with client-specific handlers
 class EventHandlerRegistry:
     """Manages event handlers with client-specific routing"""
@@ -154,12 +275,38 @@ class EventHandlerRegistry:
             'reaction': []
         }
 
+        # dispatch behaviour, see configure()
+        self.concurrent: bool = False
+        self.handler_timeout: Optional[float] = None
+        self.order: HandlerOrder = "global_first"
+
+        # told about every handler call's latency and outcome, see set_handler_observer()
+        self.observer: Optional[HandlerObserver] = None
+
+    def configure(self, concurrent: Optional[bool] = None, handler_timeout: Optional[float] = None,
+                  order: Optional[HandlerOrder] = None):
+        """
+        concurrent: run an event's handlers as separate tasks instead of awaiting them one by one
+        handler_timeout: seconds before a single handler is cancelled (concurrent mode only), 0/None to disable.
+            handlers marked with fans_out() are never timed out themselves, run_handlers() times what they call
+        order: whether global or client-specific handlers are called (or started) first
+        """
+        if concurrent is not None:
+            self.concurrent = concurrent
+        if handler_timeout is not None:
+            self.handler_timeout = handler_timeout or None
+        if order is not None:
+            if order not in ("global_first", "client_first"):
+                raise ValueError(f"Unknown handler order: {order}")
+            self.order = order
+        logger.debug("Dispatch configured: concurrent=%s, timeout=%s, order=%s", self.concurrent, self.handler_timeout, self.order)
+
     def register_global_handler(self, event_type: str, handler: Callable):
         """Register a handler for all clients"""
         if event_type not in self._global_handlers:
             raise ValueError(f"Unknown event type: {event_type}")
         self._global_handlers[event_type].append(handler)
-        logger.debug(f"Registered global {event_type} handler")
+        logger.debug("Registered global %s handler", event_type)
 
     def register_client_handler(self, client_name: str, event_type: str, handler: Callable):
         """Register a handler for a specific client"""
@@ -174,28 +321,73 @@ class EventHandlerRegistry:
             }
 
         self._client_handlers[client_name][event_type].append(handler)
-        logger.debug(f"Registered {event_type} handler for client '{client_name}'")
+        logger.debug("Registered %s handler for client '%s'", event_type, client_name)
+
+    def _handlers_for(self, client_name: str, event_type: str) -> List[Callable]:
+        global_handlers = self._global_handlers.get(event_type, [])
+        client_handlers = self._client_handlers.get(client_name, {}).get(event_type, [])
+        if self.order == "client_first":
+            return client_handlers + global_handlers
+        return global_handlers + client_handlers
+
+    async def _call_handler(self, event_type: str, handler: Callable, timeout: Optional[float], *args, **kwargs):
+        start = time.perf_counter()
+        outcome: HandlerOutcome = "error"
+        try:
+            if timeout:
+                await asyncio.wait_for(handler(*args, **kwargs), timeout)
+            else:
+                await handler(*args, **kwargs)
+            outcome = "ok"
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        finally:
+            if self.observer is not None:
+                self.observer(event_type, handler_name(handler), time.perf_counter() - start, outcome)
 
     async def dispatch(self, client_name: str, event_type: str, *args, **kwargs):
         """Dispatch an event to appropriate handlers"""
-        handlers_called = 0
+        handlers = self._handlers_for(client_name, event_type)
         # print(f"DEBUG: Dispatching {event_type} from client '{client_name}'")
 
-        # Call global handlers first
-        for handler in self._global_handlers.get(event_type, []):
-            # print(f"DEBUG: Calling global handler: {handler.__name__} (id: {id(handler)})")
-            await handler(*args, **kwargs)
-            handlers_called += 1
+        if not handlers:
+            logger.debug("No handlers for %s event from client '%s'", event_type, client_name)
+            return
 
-        # Call client-specific handlers
-        if client_name in self._client_handlers:
-            for handler in self._client_handlers[client_name].get(event_type, []):
-                # print(f"DEBUG: Calling client handler: {handler.__name__} (id: {id(handler)})")
-                await handler(*args, **kwargs)
-                handlers_called += 1
+        await self.run_handlers(event_type, handlers, *args, **kwargs)
 
-        if handlers_called == 0:
-            logger.debug(f"No handlers for {event_type} event from client '{client_name}'")
+    async def run_handlers(self, event_type: str, handlers: List[Callable], *args, **kwargs) -> List[Optional[BaseException]]:
+        """
+        Call each handler with args, isolated from the others: one that fails (or, in concurrent mode, times
+        out) is logged and doesn't stop the rest. Returns what each handler raised, None for the ones that finished.
+        """
+        if not self.concurrent:
+            errors = []
+            for handler in handlers:
+                try:
+                    await self._call_handler(event_type, handler, None, *args, **kwargs)
+                    errors.append(None)
+                except Exception as e:
+                    errors.append(e)
+        else:
+            # every handler gets its own task, and a failing or stalled handler only takes itself down
+            tasks = [
+                asyncio.create_task(
+                    self._call_handler(event_type, handler, None if is_fan_out(handler) else self.handler_timeout, *args, **kwargs),
+                    name=f"{event_type}:{handler_name(handler)}"
+                )
+                for handler in handlers
+            ]
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            errors = [result if isinstance(result, BaseException) else None for result in results]
+
+        for handler, error in zip(handlers, errors):
+            if isinstance(error, asyncio.TimeoutError):
+                logger.warning("%s handler %s timed out after %ss", event_type, handler_name(handler), self.handler_timeout)
+            elif error is not None:
+                logger.error("%s handler %s failed: %r", event_type, handler_name(handler), error, exc_info=error)
+        return errors
 
 # Singleton instance of the API manager
 class CinAPIManager: # todo: does this need to be shaped like this?
@@ -244,6 +436,22 @@ def get_all_clients() -> Dict[str, APIClient]:
     return _manager.clients.get_all()
 
 
+def configure_dispatch(concurrent: Optional[bool] = None, handler_timeout: Optional[float] = None,
+                       order: Optional[HandlerOrder] = None):
+    """Configure how events fan out to their handlers, see EventHandlerRegistry.configure()"""
+    _manager.events.configure(concurrent, handler_timeout, order)
+
+
+async def run_handlers(event_type: str, handlers: List[Callable], *args, **kwargs) -> List[Optional[BaseException]]:
+    """Call handlers the way events are dispatched to them (isolated, timed out, observed), see EventHandlerRegistry.run_handlers()"""
+    return await _manager.events.run_handlers(event_type, handlers, *args, **kwargs)
+
+
+def set_handler_observer(observer: Optional[HandlerObserver]):
+    """Report every dispatched event handler's latency and outcome to observer (cinMetrics does this on import)"""
+    _manager.events.observer = observer
+
+
 # Event handler registration with client support
 def register_ready_handler(handler: Callable[[APIClient], Awaitable[None]],
                            client_name: Optional[str] = None):
@@ -275,20 +483,134 @@ def register_reaction_handler(handler: Callable[[APIReaction, APIUser], Awaitabl
 
 
 
+QueuePolicy = Literal["block", "drop_oldest", "drop_newest"]
+
+
 class InternalEventDispatchMixin:
     """
     Mixin providing shared internal event dispatch plumbing.
+
+    With event_workers > 0, incoming events go through bounded queues instead of being dispatched
+    inline, so the SDK callback returns as soon as the event is queued. Events are sharded onto
+    workers by channel id, and each worker hands them to a lane per channel: one channel's events are
+    handled in order, different channels (same shard or not) in parallel, so a slow channel only holds
+    up itself. A worker admits at most its share of event_queue_size at a time, queued or running.
+
+    event_workers=0 dispatches inline. The default policy is "block": nothing is ever dropped. The
+    drop_oldest / drop_newest policies are opt-in, and every event they drop is logged.
     """
 
     name: str
     _setup_done: bool
 
-    def __init__(self, name: str):
+    def __init__(self, name: str, event_workers: int = 4, event_queue_size: int = 1000,
+                 event_queue_policy: QueuePolicy = "block"):
         self.name = name
         self._setup_done = False
+
+        if event_queue_policy not in ("block", "drop_oldest", "drop_newest"):
+            raise ValueError(f"Unknown event queue policy: {event_queue_policy}")
+        self.event_workers = max(0, event_workers)
+        self.event_queue_size = max(1, event_queue_size)
+        self.event_queue_policy = event_queue_policy
+        self.dropped_events = 0
+        self._event_queues: List[asyncio.Queue] = []
+        self._event_lanes: List[Dict[int, Deque[tuple]]] = []  # per worker: {channel_id: events, oldest first}
+        self._event_worker_tasks: List[asyncio.Task] = []
+        self._event_lane_tasks: Set[asyncio.Task] = set()
+
         import cinLogging
         cinLogging.printInBoxP("InternalEventDispatchMixin init", LARGE_WINDOW)
 
+    # ---------- event queue
+
+    def event_queue_depth(self) -> int:
+        """Number of events queued or running across all workers"""
+        queued = sum(queue.qsize() for queue in self._event_queues)
+        return queued + sum(len(lane) for lanes in self._event_lanes for lane in lanes.values())
+
+    def _start_event_workers(self):
+        # needs a running loop, so this happens on the first queued event rather than in __init__
+        per_worker_size = max(1, self.event_queue_size // self.event_workers)
+        for i in range(self.event_workers):
+            queue = asyncio.Queue(maxsize=per_worker_size)
+            lanes = {}
+            self._event_queues.append(queue)
+            self._event_lanes.append(lanes)
+            self._event_worker_tasks.append(asyncio.create_task(
+                self._event_worker(queue, lanes, asyncio.Semaphore(per_worker_size)),
+                name=f"{self.name}_event_worker_{i}"
+            ))
+        logger.debug("Started %d event workers for client '%s'", self.event_workers, self.name)
+
+    def _stop_event_workers(self):
+        for task in self._event_worker_tasks + list(self._event_lane_tasks):
+            task.cancel()
+        self._event_worker_tasks.clear()
+        self._event_lane_tasks.clear()
+        self._event_queues.clear()
+        self._event_lanes.clear()
+
+    async def _event_worker(self, queue: asyncio.Queue, lanes: Dict[int, Deque[tuple]], slots: asyncio.Semaphore):
+        # slots bounds what's been taken off the queue but not handled yet, so the queue still pushes back
+        while True:
+            await slots.acquire()
+            channel_id, event_type, args = await queue.get()
+            queue.task_done()
+            lane = lanes.get(channel_id)
+            if lane is not None:
+                lane.append((event_type, args))  # that channel's lane task gets to it in order
+                continue
+
+            lanes[channel_id] = deque([(event_type, args)])
+            task = asyncio.create_task(self._drain_lane(lanes, channel_id, slots), name=f"{self.name}_events_{channel_id}")
+            self._event_lane_tasks.add(task)
+            task.add_done_callback(self._event_lane_tasks.discard)
+
+    async def _drain_lane(self, lanes: Dict[int, Deque[tuple]], channel_id: int, slots: asyncio.Semaphore):
+        lane = lanes[channel_id]
+        try:
+            while lane:
+                event_type, args = lane[0]
+                try:
+                    await _manager.events.dispatch(self.name, event_type, *args)
+                except Exception as e:
+                    logger.error("Error dispatching %s event for client '%s': %r", event_type, self.name, e, exc_info=e)
+                finally:
+                    lane.popleft()
+                    slots.release()
+        finally:
+            lanes.pop(channel_id, None)
+
+    async def _enqueue_internal_event(self, channel_id: int, event_type: str, *args):
+        """
+        Queue an event for the worker owning channel_id, or dispatch it inline if workers are disabled.
+        """
+        if self.event_workers == 0:
+            await _manager.events.dispatch(self.name, event_type, *args)
+            return
+
+        if not self._event_worker_tasks:
+            self._start_event_workers()
+
+        queue = self._event_queues[hash(channel_id) % len(self._event_queues)]
+        item = (channel_id, event_type, args)
+
+        if not queue.full() or self.event_queue_policy == "block":
+            await queue.put(item)
+            return
+
+        self.dropped_events += 1
+        if self.event_queue_policy == "drop_oldest":
+            _, dropped_type, _ = queue.get_nowait()
+            queue.task_done()
+            queue.put_nowait(item)
+            logger.warning("Event queue full for client '%s', dropped oldest %s event on channel %s's shard (%d dropped so far)",
+                           self.name, dropped_type, channel_id, self.dropped_events)
+        else:
+            logger.warning("Event queue full for client '%s', dropped incoming %s event for channel %s (%d dropped so far)",
+                           self.name, event_type, channel_id, self.dropped_events)
+
     async def set_presence(self, activity: str, status: str = "online"): ...
 
     async def _setup_event_handlers(self):
@@ -318,7 +640,7 @@ class InternalEventDispatchMixin:
         Called by the concrete client when a message is received.
         """
         logger.debug("Internal message event for client '%s'", self.name)
-        await _manager.events.dispatch(self.name, 'message', message)
+        await self._enqueue_internal_event(message.channel.id, 'message', message)
 
     async def _on_internal_reaction_add(
         self,
@@ -329,4 +651,4 @@ class InternalEventDispatchMixin:
         Called by the concrete client when a reaction is added.
         """
         logger.debug("Internal reaction event for client '%s'", self.name)
-        await _manager.events.dispatch(self.name, 'reaction', reaction, user)
+        await self._enqueue_internal_event(reaction.message.channel.id, 'reaction', reaction, user)
@@ -1,9 +1,17 @@
 # handles IO, except for logging
 
+import asyncio
+import atexit
 import json
+import logging
 import os
+import sqlite3
+import threading
 import yaml
 import time
+from typing import Any, Dict, Protocol
+
+logger = logging.getLogger(__name__)
 
 cachePath = os.path.join(os.path.dirname(__file__), str("cache/"))
 configsPath = os.path.join(os.path.dirname(__file__), str("configs/"))
@@ -28,8 +36,7 @@ def writeConfig(fileName: str, configData: dict):
         with open(filePath, 'w') as configFile:
             yaml.dump(configData, configFile, default_flow_style=False)
     else:
-        # todo: logging
-        print(f"Invalid file format for config {filePath}")
+        logger.error("Invalid file format for config %s", filePath)
 
 def loadConfig(fileName: str):
     filePath = os.path.join(configsPath + fileName)
@@ -39,8 +46,64 @@ def loadConfig(fileName: str):
         elif "yaml" in fileName:
             return yaml.safe_load(thisConfigFile)
         else:
-            # todo: logging
-            print(f"invalid file format for config {filePath}")
+            logger.error("invalid file format for config %s", filePath)
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[CACHES]
+# caches are json snapshots, written atomically (temp file + rename). in journal mode, single-key updates are
+# appended to <cache>.journal instead, and replayed on load until the next full snapshot compacts them away.
+
+_pendingWrites = {}  # {fileName: data} waiting on the debounce window
+_flushHandle = None
+_journalLengths = {}  # {fileName: lines in its journal}
+
+def cacheSetting(key: str, default):
+    return config.get("cache", {}).get(key, default)
+
+def dumpJson(data, f, compact: bool = None):
+    if compact is None:
+        compact = cacheSetting("compact", True)
+    if compact:
+        json.dump(data, f, separators=(",", ":"))
+    else:
+        json.dump(data, f, indent=4)
+
+def atomicWriteJson(filePath: str, data, compact: bool = None):
+    """write json to a temp file next to filePath, then rename it over filePath. readers never see half a file"""
+    parentDir = os.path.dirname(filePath)
+    os.makedirs(parentDir or ".", exist_ok=True)
+
+    tempPath = f"{filePath}.tmp"
+    with open(tempPath, 'w') as f:
+        dumpJson(data, f, compact)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tempPath, filePath)
+
+def _journalPath(fileName: str) -> str:
+    return os.path.join(cachePath, f"{fileName}.journal")
+
+def _replayJournal(fileName: str, data):
+    journalPath = _journalPath(fileName)
+    if not os.path.isfile(journalPath):
+        return data
+
+    entries = 0
+    with open(journalPath, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # a torn last line from a crash mid-append. everything before it is still good
+                logger.warning("skipping corrupt journal line in %s", journalPath)
+                continue
+            if "set" in entry:
+                data[str(entry["set"])] = entry["value"]
+            elif "del" in entry:
+                data.pop(str(entry["del"]), None)
+            entries += 1
+
+    _journalLengths[fileName] = entries
+    return data
 
 def loadCache(fileName: str, default_value=None):
     filePath = os.path.join(cachePath, fileName)
@@ -51,7 +114,10 @@ def loadCache(fileName: str, default_value=None):
     
     if os.path.isfile(filePath):
         with open(filePath, 'r') as f:
-            return json.load(f)
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = _replayJournal(fileName, data)
+        return data
     else:
         # Use the provided default value or an empty dictionary
         if default_value is None:
@@ -62,19 +128,229 @@ def loadCache(fileName: str, default_value=None):
         return default_value
 
 def overwriteCache(fileName: str, newData):
+    """write a full snapshot of a cache right now. this also compacts away its journal"""
     thisCachePath = os.path.join(cachePath, fileName)
-    
-    # Ensure parent directories exist
-    parentDir = os.path.dirname(thisCachePath)
-    os.makedirs(parentDir, exist_ok=True)
-    
-    # Remove existing file if it exists
-    if os.path.isfile(thisCachePath):
-        os.remove(thisCachePath)
-    
-    # Write new data to the cache file
-    with open(thisCachePath, 'w') as f:
-        json.dump(newData, f, indent=4)
+    _pendingWrites.pop(fileName, None)
+
+    atomicWriteJson(thisCachePath, newData)
+
+    journalPath = _journalPath(fileName)
+    if os.path.isfile(journalPath):
+        os.remove(journalPath)
+    _journalLengths[fileName] = 0
+
+def scheduleCacheWrite(fileName: str, newData):
+    """
+    overwriteCache, but coalesced: every call inside the debounce window becomes a single write at the end of it.
+    outside of a running event loop (startup, scripts), this just writes immediately.
+    """
+    global _flushHandle
+    debounceSeconds = cacheSetting("debounceSeconds", 1.0)
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    if loop is None or debounceSeconds <= 0:
+        overwriteCache(fileName, newData)
+        return
+
+    _pendingWrites[fileName] = newData
+    if _flushHandle is None:
+        _flushHandle = loop.call_later(debounceSeconds, flushCaches)
+
+def flushCaches():
+    """write every pending debounced cache now"""
+    global _flushHandle
+    if _flushHandle is not None:
+        _flushHandle.cancel()
+        _flushHandle = None
+
+    for fileName, data in list(_pendingWrites.items()):
+        try:
+            overwriteCache(fileName, data)
+        except Exception as e:
+            logger.error("Failed to flush cache %s: %s", fileName, e)
+
+atexit.register(flushCaches)
+
+def updateCacheKey(fileName: str, data: dict, key: str):
+    """
+    persist a change to data[key] (or its removal, if key is no longer in data) for a dict cache.
+    journal mode appends just that key; otherwise the full cache is written through the debounce window.
+    json only has string keys, so a non-str key is renamed to str(key) in data too, matching what a reload gives.
+    """
+    if not isinstance(key, str):
+        if key in data:
+            data[str(key)] = data.pop(key)
+        key = str(key)
+
+    if not cacheSetting("journal", True) or fileName in _pendingWrites:
+        scheduleCacheWrite(fileName, data)
+        return
+
+    if _journalLengths.get(fileName, 0) >= cacheSetting("journalMaxEntries", 500):
+        overwriteCache(fileName, data)
+        return
+
+    if key in data:
+        entry = {"set": key, "value": data[key]}
+    else:
+        entry = {"del": key}
+
+    journalPath = _journalPath(fileName)
+    os.makedirs(os.path.dirname(journalPath), exist_ok=True)
+    with open(journalPath, 'a') as f:
+        f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+    _journalLengths[fileName] = _journalLengths.get(fileName, 0) + 1
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[STORAGE]
+# key-value storage per cache namespace (a cache's file name, like "reminders.json"), so callers can move off of
+# loadCache/overwriteCache one at a time. the backend is picked by storage.backend in config.yaml
+
+class CacheStorage(Protocol):
+    namespace: str
+
+    def load(self) -> Dict[str, Any]:
+        """every key in this namespace, as a dict"""
+        ...
+
+    def get(self, key: str, default=None) -> Any: ...
+
+    def set(self, key: str, value: Any) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+
+class JsonCacheStorage:
+    """CacheStorage over a json cache file, written through the cache journal"""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._data = loadCache(namespace)
+
+    def load(self) -> Dict[str, Any]:
+        return dict(self._data)
+
+    def get(self, key: str, default=None):
+        return self._data.get(str(key), default)
+
+    def set(self, key: str, value):
+        key = str(key)
+        self._data[key] = value
+        updateCacheKey(self.namespace, self._data, key)
+
+    def delete(self, key: str):
+        key = str(key)
+        if key in self._data:
+            del self._data[key]
+            updateCacheKey(self.namespace, self._data, key)
+
+
+_sqliteConnection = None
+_sqliteLock = threading.Lock()
+
+def getSqliteConnection() -> sqlite3.Connection:
+    """the shared cache database, opened in WAL mode on first use"""
+    global _sqliteConnection
+    if _sqliteConnection is not None:
+        return _sqliteConnection
+
+    dbPath = os.path.join(cachePath, config.get("storage", {}).get("sqlitePath", "cinnamon.db"))
+    connection = sqlite3.connect(dbPath, check_same_thread=False, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS cache_entries ("
+        "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+        "PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+    )
+    _sqliteConnection = connection
+    atexit.register(connection.close)
+    return connection
+
+
+class SqliteCacheStorage:
+    """CacheStorage over one namespace of the shared sqlite database. every write touches only its own row"""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._db = getSqliteConnection()
+
+    def load(self) -> Dict[str, Any]:
+        with _sqliteLock:
+            rows = self._db.execute("SELECT key, value FROM cache_entries WHERE namespace = ?", (self.namespace,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def get(self, key: str, default=None):
+        with _sqliteLock:
+            row = self._db.execute(
+                "SELECT value FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, str(key))
+            ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key: str, value):
+        with _sqliteLock:
+            self._db.execute(
+                "INSERT INTO cache_entries (namespace, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value",
+                (self.namespace, str(key), json.dumps(value, separators=(",", ":")))
+            )
+
+    def delete(self, key: str):
+        with _sqliteLock:
+            self._db.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, str(key)))
+
+
+def openStorage(namespace: str) -> CacheStorage:
+    backend = config.get("storage", {}).get("backend", "json")
+    if backend == "sqlite":
+        return SqliteCacheStorage(namespace)
+    if backend == "json":
+        return JsonCacheStorage(namespace)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+WHOLE_DOCUMENT_KEY = "."  # non-dict caches (like tatoclip project files) are migrated as a single entry under this key
+
+def migrateJsonCachesToSqlite(fileNames=None, overwrite: bool = False) -> Dict[str, int]:
+    """
+    import json caches (every *.json under cache/ by default) into the sqlite backend, journals included.
+    returns {namespace: entries imported}. existing rows are kept unless overwrite is set
+    """
+    if fileNames is None:
+        fileNames = []
+        for root, _, files in os.walk(cachePath):
+            for name in files:
+                if name.endswith(".json"):
+                    fileNames.append(os.path.relpath(os.path.join(root, name), cachePath).replace(os.sep, "/"))
+
+    db = getSqliteConnection()
+    verb = "INSERT OR REPLACE" if overwrite else "INSERT OR IGNORE"
+    imported = {}
+    for fileName in sorted(fileNames):
+        filePath = os.path.join(cachePath, fileName)
+        try:
+            with open(filePath, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("skipping %s: %s", fileName, e)
+            continue
+
+        if isinstance(data, dict):
+            data = _replayJournal(fileName, data)
+            rows = [(fileName, key, json.dumps(value, separators=(",", ":"))) for key, value in data.items()]
+        else:
+            rows = [(fileName, WHOLE_DOCUMENT_KEY, json.dumps(data, separators=(",", ":")))]
+
+        with _sqliteLock:
+            db.execute("BEGIN")
+            db.executemany(f"{verb} INTO cache_entries (namespace, key, value) VALUES (?, ?, ?)", rows)
+            db.execute("COMMIT")
+        imported[fileName] = len(rows)
+
+    return imported
 
 def joinWithGlobalVars(textsToJoin):
     result = []
@@ -88,8 +364,6 @@ def joinWithGlobalVars(textsToJoin):
 token = loadConfig("token.yaml")["token"]
 config = loadConfig("config.yaml")
 
-userData = loadCache("userData.json")
-
 defaultLoggingHtmlPath = os.path.join(os.path.dirname(__file__), config["defaultLoggingHtml"])
 with open(defaultLoggingHtmlPath, "r") as defaultLoggingHtmlFile:
     defaultLoggingHtml = defaultLoggingHtmlFile.readlines()
@@ -104,20 +378,78 @@ userData should look like:
 }
 '''
 
+class UserDataStore:
+    """
+    userData.json, held in memory. reads are plain dict lookups- only users whose data actually changed
+    are marked dirty, and only dirty users get written, on flush().
+    """
+
+    def __init__(self, fileName: str, flushSeconds: float = 30):
+        self.fileName = fileName
+        self.flushSeconds = flushSeconds
+        self.storage = openStorage(fileName)
+        self.data = self.storage.load()
+        self._dirty = set()
+        self._lastFlush = time.time()
+
+        # counters, to check how much disk io this is actually saving
+        self.reads = 0
+        self.writes = 0
+        self.flushes = 0
+
+    def get(self, userID: str):
+        self.reads += 1
+        return self.data.get(userID)
+
+    def set(self, userID: str, key: str, value):
+        thisUserData = self.data.setdefault(userID, {})
+        if key in thisUserData and thisUserData[key] == value:
+            return
+        thisUserData[key] = value
+        self.markDirty(userID)
+
+    def markDirty(self, userID: str):
+        self.writes += 1
+        self._dirty.add(userID)
+
+    def flush(self):
+        """persist every dirty user now"""
+        self._lastFlush = time.time()
+        if not self._dirty:
+            return
+
+        dirty, self._dirty = self._dirty, set()
+        for userID in dirty:
+            if userID in self.data:
+                self.storage.set(userID, self.data[userID])
+            else:
+                self.storage.delete(userID)
+        self.flushes += 1
+
+    def flushIfDue(self):
+        """flush, if it's been flushSeconds since the last one. meant to be called from the main loop"""
+        if self._dirty and time.time() - self._lastFlush >= self.flushSeconds:
+            self.flush()
+
+    def counters(self) -> dict:
+        return {"reads": self.reads, "writes": self.writes, "flushes": self.flushes, "dirty": len(self._dirty)}
+
+userDataStore = UserDataStore("userData.json", config.get("userDataFlushSeconds", 30))
+userData = userDataStore.data
+atexit.register(userDataStore.flush)  # registered after flushCaches, so it runs first
+
 def newUserData(userID: str):
     # use cinnamon's timezone as default- get hyucked people that actually use cinmin
-    userData[userID] = {"timezone": time.timezone/3600} # todo: put default userData somewhere in a config
-    overwriteCache("userData.json", userData)
+    userDataStore.set(userID, "timezone", time.timezone/3600) # todo: put default userData somewhere in a config
     return userData[userID]
 
 def getOrCreateUserData(userID: str):
     # Check if userID is in userData dict
-    thisUserData = userData.get(userID)
+    thisUserData = userDataStore.get(userID)
 
     # If it is, return their data
     if thisUserData is not None:
-        overwriteCache("userData.json", userData)
         return thisUserData
     else:
         # If it isn't, add it with default values
-        return newUserData(userID)
\ No newline at end of file
+        return newUserData(userID)
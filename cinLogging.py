@@ -1,11 +1,22 @@
 # cinLogging.py
+import atexit
+import calendar
+import functools
+import gzip
+import json
+import logging
 import os
+import shutil
+import queue
 import re
+import sys
+import threading
 import time
-from typing import List
+from collections import OrderedDict
+from typing import Callable, List
 
 from cinAPI import APIMessage
-from cinIO import defaultLoggingHtml
+from cinIO import defaultLoggingHtml, config
 from cinPalette import *
 
 regularTextHTMLHeader = '<p class="text"'
@@ -15,6 +26,448 @@ urlRegex = 'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9
 def getURLs(string):
     return re.findall(urlRegex, string)
 
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[CONSOLE]
+
+CONSOLE_ESCAPE = re.compile(r"\033[^m]*m?")
+
+
+class ConsoleSink:
+    """
+    Everything cinLogging prints goes through here, so a slow stdout (a pipe into journald or docker logs)
+    can't stall the event loop.
+
+    Until start() it just writes straight through. After, output is queued for a writer thread; once
+    maxQueued writes are waiting, new ones are dropped and counted instead of blocking, and a notice with
+    the count is written when the thread catches up. start() also swaps sys.stdout for the sink, so
+    plain print() calls stay in order with everything else.
+    Writes below minLevel are dropped before formatting (callers check enabled()). headless strips
+    colors, and cinLogging skips drawing boxes altogether.
+    """
+
+    def __init__(self, minLevel: int = logging.INFO, headless: bool = False, maxQueued: int = 10000):
+        self.minLevel = minLevel
+        self.headless = headless
+        self.maxQueued = maxQueued
+        self.dropped = 0
+        self.filtered = 0
+        self._reportedDrops = 0
+        self._stream = None  # the real stdout, once started
+        self._queue = None
+        self._thread = None
+
+    def enabled(self, level: int) -> bool:
+        if level >= self.minLevel:
+            return True
+        self.filtered += 1
+        return False
+
+    def emit(self, text: str, level: int = logging.INFO):
+        """write text and a newline"""
+        if level >= self.minLevel:
+            self.write(f"{text}\n")
+        else:
+            self.filtered += 1
+
+    def write(self, text: str):
+        if self.headless and "\033" in text:
+            text = CONSOLE_ESCAPE.sub("", text)
+        if self._queue is None:
+            sys.stdout.write(text)
+            return
+        try:
+            self._queue.put_nowait(text)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        """move writing onto the writer thread and route sys.stdout through the sink"""
+        if self._thread is not None:
+            return
+        self._stream = sys.stdout
+        self._queue = queue.Queue(maxsize=self.maxQueued)
+        self._thread = threading.Thread(target=self._run, name="cinLogging_console", daemon=True)
+        self._thread.start()
+        sys.stdout = _ConsoleStream(self)
+
+    def flush(self, timeout: float = 5.0):
+        """block until everything queued so far is written"""
+        if self._queue is None:
+            sys.stdout.flush()
+            return
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            flushRequest = item if isinstance(item, threading.Event) else None
+            try:
+                if flushRequest is None:
+                    self._stream.write(item)
+                if flushRequest or self._queue.empty():
+                    if self.dropped != self._reportedDrops:
+                        self._stream.write(f"[console: dropped {self.dropped - self._reportedDrops} writes]\n")
+                        self._reportedDrops = self.dropped
+                    self._stream.flush()
+            except (OSError, ValueError):
+                pass  # nowhere left to complain to
+            if flushRequest:
+                flushRequest.set()
+
+
+class _ConsoleStream:
+    """
+    sys.stdout stand-in that hands print()'s output to the sink. anything else (encoding, fileno(), buffer, ...)
+    is the real stdout's, so code that pokes at sys.stdout beyond write() keeps working
+    """
+
+    def __init__(self, sink: ConsoleSink):
+        self._sink = sink
+
+    def write(self, text: str) -> int:
+        self._sink.write(text)
+        return len(text)
+
+    def writelines(self, lines):
+        for line in lines:
+            self._sink.write(line)
+
+    def flush(self):
+        pass
+
+    def isatty(self) -> bool:
+        return False
+
+    def __getattr__(self, name):
+        if name == "_sink":
+            raise AttributeError(name)
+        return getattr(self._sink._stream, name)
+
+
+def levelNumber(level) -> int:
+    """a logging level from a name ("debug", "INFO") or a number"""
+    if isinstance(level, int):
+        return level
+    number = logging.getLevelName(str(level).upper())
+    return number if isinstance(number, int) else logging.INFO
+
+
+consoleConfig = config.get("console", {})
+consoleSink = ConsoleSink(
+    minLevel=levelNumber(consoleConfig.get("level", "info")),
+    headless=consoleConfig.get("headless", False),
+    maxQueued=consoleConfig.get("maxQueued", 10000)
+)
+atexit.register(consoleSink.flush)
+
+
+def startConsole():
+    """called once the bot's up. stays synchronous for tools and benchmarks that never call it"""
+    if consoleConfig.get("async", True):
+        consoleSink.start()
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[LOGGERS]
+
+# standard logging underneath, so modules that can't import cinLogging (cinAPI, cinIO) just use logging.getLogger
+LEVEL_COLORS = {
+    logging.DEBUG: debugColor,
+    logging.INFO: defaultColor,
+    logging.WARNING: highlightedColor,
+    logging.ERROR: errorColor,
+    logging.CRITICAL: errorColor,
+}
+
+
+class ConsoleSinkHandler(logging.Handler):
+    """hands log records to the console sink, colored by level"""
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            text = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        # already filtered by the logger's own level, so this skips the sink's
+        consoleSink.write(f"{indent}{LEVEL_COLORS.get(record.levelno, defaultColor)}{text}{clearFormatting}\n")
+
+
+def getLogger(name: str) -> logging.Logger:
+    """
+    Per-module logger: getLogger(__name__). Pass arguments %-style, logger.debug("sent %s", thing), rather than
+    as an f-string, so nothing gets formatted at levels that are turned off.
+    """
+    return logging.getLogger(name)
+
+
+def configureLogging(settings: dict = None):
+    """levels and format from the config's logging section. output goes through the console sink"""
+    settings = config.get("logging", {}) if settings is None else settings
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, ConsoleSinkHandler):
+            root.removeHandler(handler)
+
+    handler = ConsoleSinkHandler()
+    handler.setFormatter(logging.Formatter(settings.get("format", "%(name)s: %(message)s")))
+    root.addHandler(handler)
+    root.setLevel(levelNumber(settings.get("level", "info")))
+    for name, level in settings.get("modules", {}).items():
+        logging.getLogger(name).setLevel(levelNumber(level))
+
+
+configureLogging()
+logger = getLogger(__name__)
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[LOG ROTATION]
+
+def _segmentBase(logPath: str) -> str:
+    return os.path.splitext(logPath)[0]
+
+def logIndexPath(logPath: str) -> str:
+    return f"{_segmentBase(logPath)}.index.json"
+
+def loadLogIndex(logPath: str) -> dict:
+    """{"segments": [{"file", "start", "end", "bytes", "records"}, ...]}, oldest first. file is relative to the log's folder"""
+    try:
+        with open(logIndexPath(logPath), 'r') as indexFile:
+            return json.load(indexFile)
+    except (OSError, json.JSONDecodeError):
+        return {"segments": []}
+
+def _saveLogIndex(logPath: str, index: dict):
+    indexPath = logIndexPath(logPath)
+    with open(f"{indexPath}.tmp", 'w') as indexFile:
+        json.dump(index, indexFile, separators=(",", ":"))
+    os.replace(f"{indexPath}.tmp", indexPath)
+
+def _firstRecordTime(logPath: str):
+    try:
+        with open(logPath, 'r', encoding='utf-8') as logFile:
+            return json.loads(logFile.readline()).get("time")
+    except (OSError, json.JSONDecodeError, AttributeError):
+        return None
+
+
+class LogRotator:
+    """
+    Rotates a channel's active log once it's over maxBytes or maxAgeHours old. The rotated segment is gzipped
+    to <channel>.<start>-<end>.jsonl.gz and recorded, with its time range, in <channel>.index.json, so a date
+    range can be found without opening any segment. Segments past retentionDays / maxSegments are deleted;
+    0 disables any of the limits, and both default to 0, so nothing is ever deleted unless asked for. Only ever called from the log writer thread.
+    """
+
+    def __init__(self, maxBytes: int = 0, maxAgeHours: float = 0, retentionDays: float = 0, maxSegments: int = 0):
+        self.maxBytes = maxBytes
+        self.maxAgeSeconds = maxAgeHours * 3600
+        self.retentionSeconds = retentionDays * 86400
+        self.maxSegments = maxSegments
+        self._activeSince = {}  # {logPath: time of its first record}
+
+    def shouldRotate(self, logPath: str, handle) -> bool:
+        if self.maxBytes and handle.tell() >= self.maxBytes:
+            return True
+        if self.maxAgeSeconds:
+            if logPath not in self._activeSince:
+                self._activeSince[logPath] = _firstRecordTime(logPath) or time.time()
+            return time.time() - self._activeSince[logPath] >= self.maxAgeSeconds
+        return False
+
+    def rotate(self, logPath: str):
+        """compress the (closed) active log into a segment, index it, and apply retention"""
+        self._activeSince.pop(logPath, None)
+        if not os.path.isfile(logPath) or os.path.getsize(logPath) == 0:
+            return
+
+        start = end = None
+        records = 0
+        for record in readLogRecords(logPath):
+            records += 1
+            recordTime = record.get("time")
+            if recordTime is not None:
+                start = recordTime if start is None else min(start, recordTime)
+                end = recordTime if end is None else max(end, recordTime)
+        start = start or time.time()
+        end = end or start
+
+        stamp = lambda t: time.strftime("%Y%m%dT%H%M%S", time.gmtime(t))
+        segmentPath = f"{_segmentBase(logPath)}.{stamp(start)}-{stamp(end)}.jsonl.gz"
+        suffix = 1
+        while os.path.exists(segmentPath):
+            segmentPath = f"{_segmentBase(logPath)}.{stamp(start)}-{stamp(end)}_{suffix}.jsonl.gz"
+            suffix += 1
+
+        with open(logPath, 'rb') as source, gzip.open(f"{segmentPath}.tmp", 'wb') as target:
+            shutil.copyfileobj(source, target)
+        os.replace(f"{segmentPath}.tmp", segmentPath)
+
+        index = loadLogIndex(logPath)
+        index["segments"].append({
+            "file": os.path.basename(segmentPath),
+            "start": start,
+            "end": end,
+            "bytes": os.path.getsize(segmentPath),
+            "records": records,
+        })
+        self._applyRetention(logPath, index)
+        _saveLogIndex(logPath, index)
+        os.remove(logPath)  # only once the segment and index are safely written
+
+    def _applyRetention(self, logPath: str, index: dict):
+        segments = index["segments"]
+        keep = segments
+        if self.retentionSeconds:
+            cutoff = time.time() - self.retentionSeconds
+            keep = [segment for segment in keep if segment["end"] >= cutoff]
+        if self.maxSegments and len(keep) > self.maxSegments:
+            keep = keep[-self.maxSegments:]
+
+        folder = os.path.dirname(logPath)
+        for segment in segments:
+            if segment not in keep:
+                try:
+                    os.remove(os.path.join(folder, segment["file"]))
+                except OSError:
+                    pass
+        index["segments"] = keep
+
+
+def findLogSegments(logPath: str, start: float = None, end: float = None) -> List[str]:
+    """paths of every rotated segment of a log overlapping [start, end], oldest first. reads only the index"""
+    folder = os.path.dirname(logPath)
+    return [
+        os.path.join(folder, segment["file"])
+        for segment in loadLogIndex(logPath)["segments"]
+        if (start is None or segment["end"] >= start) and (end is None or segment["start"] <= end)
+    ]
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[LOG WRITER]
+
+class LogWriter:
+    """
+    Owns every chat log file, on a background thread, so the event loop never waits on disk for logging.
+
+    write() just queues a fragment. The thread batches fragments per file and writes them out every
+    flushInterval seconds, or sooner once flushBytes are buffered. Open handles are kept in an LRU pool
+    of at most maxOpenFiles, and new files start with newFileHeader, if there is one.
+    """
+
+    def __init__(self, maxOpenFiles: int = 32, flushInterval: float = 2.0, flushBytes: int = 64 * 1024,
+                 newFileHeader: List[str] = None, rotator: LogRotator = None):
+        self.maxOpenFiles = max(1, maxOpenFiles)
+        self.newFileHeader = newFileHeader
+        self.rotator = rotator
+        self.flushInterval = flushInterval
+        self.flushBytes = flushBytes
+
+        self._queue = queue.Queue()
+        self._handles = OrderedDict()  # {path: file}, least recently used first
+        self._thread = None
+        self._startLock = threading.Lock()
+
+    def write(self, path: str, fragment: str):
+        if self._thread is None:
+            self._start()
+        self._queue.put((path, fragment))
+
+    def flush(self, timeout: float = 5.0):
+        """block until everything queued so far is on disk"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put((None, done))
+        done.wait(timeout)
+
+    def close(self):
+        self.flush()
+        for handle in self._handles.values():
+            handle.close()
+        self._handles.clear()
+
+    def _start(self):
+        with self._startLock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="cinLogging_writer", daemon=True)
+                self._thread.start()
+
+    def _handle(self, path: str):
+        handle = self._handles.get(path)
+        if handle is not None:
+            self._handles.move_to_end(path)
+            return handle
+
+        if len(self._handles) >= self.maxOpenFiles:
+            _, oldest = self._handles.popitem(last=False)
+            oldest.close()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        isNew = not os.path.isfile(path)
+        handle = open(path, 'a', encoding='utf-8')
+        if isNew and self.newFileHeader:
+            handle.writelines(self.newFileHeader)
+        self._handles[path] = handle
+        return handle
+
+    def _writeBatch(self, pending: dict):
+        for path, fragments in pending.items():
+            try:
+                handle = self._handle(path)
+                if self.rotator and self.rotator.shouldRotate(path, handle):
+                    self._handles.pop(path).close()
+                    self.rotator.rotate(path)
+                    handle = self._handle(path)
+                handle.write("".join(fragments))
+                handle.flush()
+            except OSError as e:
+                printErr(f"failed to write log {path}: {e}{clearFormatting}")
+        pending.clear()
+
+    def _run(self):
+        pending = {}
+        pendingBytes = 0
+        lastFlush = time.monotonic()
+
+        while True:
+            timeout = max(0.0, self.flushInterval - (time.monotonic() - lastFlush))
+            try:
+                path, fragment = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                path = fragment = None
+
+            flushRequest = None
+            if path is not None:
+                pending.setdefault(path, []).append(fragment)
+                pendingBytes += len(fragment)
+            elif isinstance(fragment, threading.Event):
+                flushRequest = fragment
+
+            if flushRequest or pendingBytes >= self.flushBytes or time.monotonic() - lastFlush >= self.flushInterval:
+                self._writeBatch(pending)
+                pendingBytes = 0
+                lastFlush = time.monotonic()
+                if flushRequest:
+                    flushRequest.set()
+
+
+chatLogConfig = config.get("chatLogs", {})
+logWriter = LogWriter(
+    maxOpenFiles=chatLogConfig.get("maxOpenFiles", 32),
+    flushInterval=chatLogConfig.get("flushIntervalSeconds", 2.0),
+    flushBytes=chatLogConfig.get("flushBytes", 64 * 1024),
+    rotator=LogRotator(
+        maxBytes=chatLogConfig.get("rotateBytes", 0),
+        maxAgeHours=chatLogConfig.get("rotateHours", 0),
+        retentionDays=chatLogConfig.get("retentionDays", 0),
+        maxSegments=chatLogConfig.get("maxSegments", 0)
+    )
+)
+atexit.register(logWriter.close)
+
+logsPath = os.path.join(os.path.dirname(__file__), "logs")
+
 def getLogFilePath(message: APIMessage) -> str:
     # Use guild name if available, otherwise use "DM"
     guild_name = "DM"
@@ -25,15 +478,8 @@ def getLogFilePath(message: APIMessage) -> str:
     # Use channel ID for uniqueness in DMs
     channel_identifier = str(message.channel.name) if message.guild else f"dm_{message.channel.name}"
 
-    logFolderPath = os.path.join(os.path.dirname(__file__), f"logs/{guild_name}")
-    logFilePath = os.path.join(logFolderPath, f"{channel_identifier}.html")
-
-    os.makedirs(logFolderPath, exist_ok=True)
-
-    if not os.path.isfile(logFilePath):
-        with open(logFilePath, "w+") as logFile:
-            logFile.writelines(defaultLoggingHtml)
-    return logFilePath
+    # no filesystem access here- the writer thread creates folders and files as it needs them
+    return os.path.join(logsPath, guild_name, f"{channel_identifier}.jsonl")
 
 def getAttachments(message: APIMessage) -> List[str]: # todo: deduplicate links, and move to cinAPI
     attachments = []
@@ -56,45 +502,96 @@ def getAttachments(message: APIMessage) -> List[str]: # todo: deduplicate links,
 
 # formatting
 
-def _step_escape(char: str, in_escape: bool) -> tuple[bool, bool]:
-    """
-    Process a single character for ANSI escapes.
-    Returns (is_visible, new_in_escape).
-    """
-    if in_escape:
-        return False, char != 'm'
-
-    if char == '\033':
-        return False, True
-
-    return True, False
+ANSI_ESCAPE = re.compile(r"(\033[^m]*m?)")
 
 
-def _process_escape_sequences(chars: list, start_index: int = 0, track_last_space: bool = False) -> tuple[int, bool, int]:
-    visible_count = 0
-    in_escape = False
-    last_space = -1
-
-    for i in range(start_index, len(chars)):
-        char = chars[i]
-        is_visible, in_escape = _step_escape(char, in_escape)
-
-        if not is_visible:
+def _wrapLine(line: str, usableWidth: int, lines: list):
+    """
+    Wrap one newline-free line into lines. Escapes take no width. A line breaks once it holds usableWidth
+    visible characters: at its last space (which is dropped), or right there if it has no space.
+    """
+    if "\033" not in line:
+        # plain text, the usual case for message content: every break is found with slicing and rfind
+        while line and len(line) >= usableWidth:
+            row = line[:max(1, usableWidth)]
+            space = row.rfind(" ")
+            if space == -1:
+                lines.append(row)
+                line = line[len(row):]
+            else:
+                lines.append(row[:space])
+                line = line[space + 1:]
+        return [line] if line else []
+
+    parts = []  # plain runs and whole escapes, in order. plain runs never start with an escape
+    visible = 0
+    lastSpace = None  # (part index, offset) of the last visible space in parts
+
+    # split on a capturing group alternates plain text (even indexes) and escapes (odd)
+    for i, run in enumerate(ANSI_ESCAPE.split(line)):
+        if i % 2:
+            parts.append(run)
             continue
+        start = 0
+        while start < len(run):
+            chunk = run[start:start + max(1, usableWidth - visible)]
+            start += len(chunk)
+            parts.append(chunk)
+            space = chunk.rfind(" ")
+            if space != -1:
+                lastSpace = (len(parts) - 1, space)
+            visible += len(chunk)
+            if visible >= usableWidth:
+                parts, visible, lastSpace = _breakLine(parts, lastSpace, lines)
+    return parts
+
+
+def _breakLine(parts: list, lastSpace, lines: list):
+    """emit one wrapped line from parts, returning (parts, visible, lastSpace) for what carries over"""
+    if lastSpace is None:
+        lines.append("".join(parts))
+        return [], 0, None
+
+    index, offset = lastSpace
+    lines.append("".join(parts[:index]) + parts[index][:offset])
+    carried = parts[index][offset + 1:]
+    remaining = ([carried] if carried else []) + parts[index + 1:]
+
+    visible = 0
+    lastSpace = None
+    for i, part in enumerate(remaining):
+        if part.startswith("\033"):
+            continue
+        visible += len(part)
+        space = part.rfind(" ")
+        if space != -1:
+            lastSpace = (i, space)
+    return remaining, visible, lastSpace
+
+
+@functools.lru_cache(maxsize=256)
+def renderBox(text: str, params: BoxParams) -> str:
+    """every row of text boxed up per params, as one string. cached, since status lines repeat a lot"""
+    firstBorder = "| |" if params.alt_first_border else "||"
+    inner_indent = indent * params.indentation
+    usableWidth = params.width - len(inner_indent)
+    prefix = f"{indent * params.box_indentation}{params.box_color}{firstBorder}{inner_indent}{params.text_color}"
+    suffix = f"{indent * 2}{params.box_color}|{clearFormatting}"
 
-        if track_last_space and char == ' ':
-            last_space = i
-
-        visible_count += 1
-
-    return visible_count, in_escape, last_space
-
-
+    lines = []
+    textLines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    for i, textLine in enumerate(textLines):
+        parts = _wrapLine(textLine, usableWidth, lines)
+        # a newline always ends a row, even an empty one. the end of the text only does if there's something left
+        if parts or i < len(textLines) - 1:
+            lines.append("".join(parts))
+
+    rows = []
+    for line in lines:
+        padding = usableWidth - len(ANSI_ESCAPE.sub("", line) if "\033" in line else line)
+        rows.append(f"{prefix}{line}{' ' * padding if padding > 0 else ''}{suffix}")
+    return "\n".join(rows)
 
-def _get_visible_width(text: str) -> int:
-    """Calculate the visible width of text, ignoring ANSI escape sequences."""
-    visible_count, _, _ = _process_escape_sequences(list(text))
-    return visible_count
 
 def printInBoxP(text: str, params: BoxParams):
     return printInBox(
@@ -116,100 +613,24 @@ def printInBox(text: str, boxColor: str, boxIndentation: int = 1, indentation: i
     if boxIndentation < 0 or indentation < 0:
         raise ValueError("Indentation values must be non-negative")
 
-    # constants
-    BORDER_ALT = "| |"
-    BORDER_NORMAL = "||"
-    firstBorder = BORDER_ALT if altFirstBorder else BORDER_NORMAL
-    box_indent = indent * boxIndentation
-    inner_indent = indent * indentation
-
-    # cleanup
-    text = text.replace('\r\n', '\n').replace('\r', '\n')
-
-    # setup
-    usable_width = width - len(inner_indent)
+    if not consoleSink.enabled(logging.INFO):
+        return
+    if consoleSink.headless:
+        if text.strip():
+            consoleSink.emit(text.strip())
+        return
 
-    current_line = []
-    lines = []
-    current_pos = 0
-    text_length = len(text)
-
-    in_escape = False
-    visible_count = 0
-
-    while current_pos < text_length:
-        char = text[current_pos]
-        if char == '\n': # immediately break on newline
-            line = ''.join(current_line)
-            lines.append(line)
-            current_line = []
-            visible_count = 0
-            current_pos += 1
-            continue
-        # not on newline
-
-        # escape sequences (very redundant redundancy is redundant)
-        if in_escape:
-            current_line.append(char)
-            if char == 'm':
-                in_escape = False
-            current_pos += 1
-            continue
-        if char == '\033':
-            in_escape = True
-            current_line.append(char)
-            current_pos += 1
-            continue
-        # not on newline or in escape sequence: count char as visible
-        current_line.append(char)
-        visible_count += 1
-
-        if visible_count >= usable_width:
-            # visible width exceeded, break line
-            # look for last space in visible characters using helper
-            visible_chars, _, last_space = _process_escape_sequences(current_line, track_last_space=True)
-
-            # if we found a space within usable width, split the line at that point
-            if last_space != -1:
-                line = ''.join(current_line[:last_space])
-                lines.append(line)
-                remaining = current_line[last_space + 1:]
-                current_line = []
-
-                # recalculate visible count for remaining line using helper
-                visible_count, _ = _process_escape_sequences(remaining)[:2]
-                current_line = remaining
-
-                # Adjust position to account for characters we're keeping
-                current_pos = current_pos - (len(current_line) - visible_count)
-            else:  # otherwise, ya yeet
-                line = ''.join(current_line)
-                lines.append(line)
-                current_line = []
-                visible_count = 0
-        # step
-        current_pos += 1
-
-    if current_line:
-        lines.append(''.join(current_line))
-
-    # Print with proper padding
-    for line in lines:
-        visible_width = _get_visible_width(line)
-        padding_needed = usable_width - visible_width
-        if padding_needed > 0:
-            padding = " " * padding_needed
-            print(
-                f"{box_indent}{boxColor}{firstBorder}{inner_indent}{color}{line}{padding}{indent * 2}{boxColor}|{clearFormatting}")
-        else:
-            print(
-                f"{box_indent}{boxColor}{firstBorder}{inner_indent}{color}{line}{indent * 2}{boxColor}|{clearFormatting}")
+    rendered = renderBox(text, BoxParams(boxColor, boxIndentation, indentation, width, color, altFirstBorder))
+    if rendered:
+        consoleSink.emit(rendered)
 
 def printBoxBorder(indentation: int = 1, width: int = 40, boxColor: str = highlightedColor):
-    print(f"{indent*indentation}{boxColor}(-){'=' * width}=){clearFormatting}")
+    if not consoleSink.headless:
+        consoleSink.emit(f"{indent*indentation}{boxColor}(-){'=' * width}=){clearFormatting}")
 
 def printBoxBorderP(params: BoxParams = LARGE_WINDOW):
-    print(f"{indent*params.box_indentation}{params.box_color}(-){'=' * params.width}=){clearFormatting}")
+    if not consoleSink.headless:
+        consoleSink.emit(f"{indent*params.box_indentation}{params.box_color}(-){'=' * params.width}=){clearFormatting}")
 
 def printLoadStatus(label: str, success: int, attempted: int, indentation: int = 1, width: int = 40):
     """
@@ -233,8 +654,18 @@ def printLoadStatus(label: str, success: int, attempted: int, indentation: int =
 lastMessageChannelID = 0
 
 
+def printMessageLine(message: APIMessage, authorName: str):
+    """headless stand-in for the message boxes: one plain line per message"""
+    guild = f"{message.guild.name}/" if message.guild else ""
+    channel_name = message.channel.name if hasattr(message.channel, 'name') else "Unknown"
+    content = message.content.replace("\n", "\\n")
+    consoleSink.emit(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {guild}{channel_name} {authorName}: {content}")
+
+
 def printCinnamonMessage(message: APIMessage):
     global lastMessageChannelID
+    if consoleSink.headless:
+        return printMessageLine(message, ">>>CINNAMON")
     shouldLabel = lastMessageChannelID != message.channel.id
 
     try:
@@ -246,18 +677,20 @@ def printCinnamonMessage(message: APIMessage):
         if shouldLabel:
             if lastMessageChannelID != 0:
                 printBoxBorderP(LARGE_WINDOW_BORDER)
-                print()
+                consoleSink.emit("")
             printBoxBorderP(LARGE_WINDOW_BORDER)
             printInBoxP(f"{labelColor}{guild_info}{channel_name}", LARGE_WINDOW_HEADER)
             printBoxBorderP(LARGE_WINDOW_BORDER)
         printInBoxP(f"{debugColor}    >>>CINNAMON \n{message.content}", LARGE_WINDOW)
         lastMessageChannelID = message.channel.id
     except Exception as e:
-        print(f'    {labelColor}Cinnamon (error: {e}): {message.content}')
+        consoleSink.emit(f'    {labelColor}Cinnamon (error: {e}): {message.content}', logging.ERROR)
 
 
 def printHumanMessage(message: APIMessage):
     global lastMessageChannelID
+    if consoleSink.headless:
+        return printMessageLine(message, message.author.display_name)
     shouldLabel = lastMessageChannelID != message.channel.id
 
     try:
@@ -268,31 +701,49 @@ def printHumanMessage(message: APIMessage):
         if shouldLabel:
             if lastMessageChannelID != 0:
                 printBoxBorderP(LARGE_WINDOW_BORDER)
-                print()
+                consoleSink.emit("")
             printBoxBorderP(LARGE_WINDOW_BORDER)
             printInBoxP(f"{labelColor}{guild_info}{channel_name}", LARGE_WINDOW_HEADER)
             printBoxBorderP(LARGE_WINDOW_BORDER)
         printInBoxP(f"{highlightedColor}    {message.author.display_name}:{defaultColor} \n{message.content}", LARGE_WINDOW)
         lastMessageChannelID = message.channel.id
     except Exception as e:
-        print(f'    {labelColor}{message.author.display_name} (error: {e}): {message.content}')
-
-def logCinnamonMessage(message: APIMessage):
-    logFilePath = getLogFilePath(message)
-    if logFilePath:
-        now = time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.gmtime())
-        with open(logFilePath, 'a', encoding='utf-8') as logFile:
-            logFile.write(
-                f'{regularTextHTMLHeader} style="background-color: {message.author.color}">{now}<br /><br />CINNAMON (bot): {message.content}<br /></p>')
-
-
-def logDiscordMessage(message: APIMessage):
-    logFilePath = getLogFilePath(message)
-    if logFilePath:
-        now = time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.gmtime())
-        with open(logFilePath, 'a', encoding='utf-8') as logFile:
-            logFile.write(
-                f'{regularTextHTMLHeader} style="background-color: {message.author.color}">{now}<br /><br />{message.author.display_name}: {message.content}<br /></p>')
+        consoleSink.emit(f'    {labelColor}{message.author.display_name} (error: {e}): {message.content}', logging.ERROR)
+
+def messageRecord(message: APIMessage) -> dict:
+    """everything a chat log keeps about a message, as one json-able dict"""
+    return {
+        "time": time.time(),
+        "author": message.author.display_name,
+        "author_id": message.author.id,
+        "bot": message.author.bot,
+        "color": message.author.color,
+        "channel": message.channel.name,
+        "channel_id": message.channel.id,
+        "guild": message.guild.name if message.guild else None,
+        "guild_id": message.guild.id if message.guild else None,
+        "content": message.content,
+        "attachments": [] if message.author.bot else getLoggableAttachments(message),
+    }
+
+
+# called with every record logMessage writes. listeners run on the event loop, so they should only hand the record off
+logListeners: List[Callable[[dict], None]] = []
+
+def addLogListener(listener: Callable[[dict], None]):
+    if listener not in logListeners:
+        logListeners.append(listener)
+
+
+def logMessage(message: APIMessage) -> dict:
+    record = messageRecord(message)
+    logWriter.write(getLogFilePath(message), json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+    for listener in logListeners:
+        try:
+            listener(record)
+        except Exception as e:
+            printErr(f"log listener {listener} failed: {e}")
+    return record
 
 
 # ---------- end print/log message of type
@@ -300,12 +751,13 @@ def logDiscordMessage(message: APIMessage):
 async def tryToLog(message: APIMessage):
     if message.author.bot:
         printCinnamonMessage(message)
-        logCinnamonMessage(message)
+        logMessage(message)
     else:
         printHumanMessage(message)
-        logDiscordMessage(message)
-        logAttachmentsFromMessage(message)
-    printInBoxP(f"{debugColor}                                                                                @" + time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.gmtime()), LARGE_WINDOW)
+        record = logMessage(message)
+        printAttachments(record["attachments"])
+    if not consoleSink.headless:  # the message line has the time already
+        logger.debug("logged at %s", message.created_at)
 
 
 
@@ -314,58 +766,146 @@ async def tryToLog(message: APIMessage):
 def printLabelWithInfo(label, info=None):
     if info:
         info = f"{highlightedColor}{info}"
-        print(f"  {labelColor}{label}: {highlightedColor}{info}")
+        consoleSink.emit(f"  {labelColor}{label}: {highlightedColor}{info}")
     else:
-        print(f"  {labelColor}{label}")
+        consoleSink.emit(f"  {labelColor}{label}")
 
 
 def printHighlighted(text, indentation = 1):
-    print(f"{indent*indentation}{highlightedColor}{text}")
+    consoleSink.emit(f"{indent*indentation}{highlightedColor}{text}")
 
 
 def printDefault(text, indentation = 1):
-    print(f"{indent*indentation}{defaultColor}{text}")
+    consoleSink.emit(f"{indent*indentation}{defaultColor}{text}")
 
 
 def printErr(text, indentation = 1):
-    print(f"{indent*indentation}{errorColor}{text}")
+    consoleSink.emit(f"{indent*indentation}{errorColor}{text}", logging.ERROR)
 
 
 def printDebug(text, indentation = 1):
-    print(f"{indent*indentation}{debugColor}{text}")
+    if consoleSink.enabled(logging.DEBUG):
+        consoleSink.emit(f"{indent*indentation}{debugColor}{text}", logging.DEBUG)
 
 
-def logAttachmentsFromMessage(message: APIMessage):
-    attachments = getAttachments(message)
-    logFilePath = getLogFilePath(message)
+def getLoggableAttachments(message: APIMessage) -> List[str]:
+    """getAttachments, minus duplicates and anything too short to be a url"""
+    loggable = []
+    for file_url in getAttachments(message):
+        if file_url and len(file_url) > 3 and file_url not in loggable:
+            loggable.append(file_url)
+    return loggable
 
-    log_entries = []
-    logged_urls = []
 
-    if not attachments or len(attachments) == 0: return
+def printAttachments(attachments: List[str]):
+    if not attachments:
+        return
 
     printInBoxP("attachments:", LARGE_WINDOW)
-
     for file_url in attachments:
-        if file_url and len(file_url) > 3:  # Ensure it's a valid URL
-            # Check if attachment ends with a file extension
-            if file_url in logged_urls: continue
-            logged_urls.append(file_url)
-
-            printInBoxP(f"{highlightedColor}{file_url}", LARGE_WINDOW)
-
-            # Determine if the attached file is an image or not
-            if any(ext in file_url.lower() for ext in [".jpg", ".jpeg", ".png", ".webp", ".gif"]):
-                log_entries.append(
-                    f'\n{indentedLoggingCSSHeader} style="background-color: {message.author.color};">'
-                    f'<img src="{file_url}" alt="{file_url}" class="embeddedImage" style="max-height: 50%; height: auto;" loading="lazy">'
-                    f'</p>'
-                )
-            else:
-                log_entries.append(
-                    f'\n<a href="{file_url}" style="background-color: rgba(150, 200, 255, 0.2);">{file_url}</a>'
-                )
+        printInBoxP(f"{highlightedColor}{file_url}", LARGE_WINDOW)
 
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[HTML RENDERING]
+# chat logs are stored as json lines; this turns them back into the defaultLoggingHTML view, whenever someone wants one
+
+def renderRecordHtml(record: dict) -> str:
+    now = time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.gmtime(record["time"]))
+    name = "CINNAMON (bot)" if record.get("bot") else record.get("author")
+    color = record.get("color")
+    html = f'{regularTextHTMLHeader} style="background-color: {color}">{now}<br /><br />{name}: {record.get("content", "")}<br /></p>'
+
+    log_entries = []
+    for file_url in record.get("attachments", []):
+        # Determine if the attached file is an image or not
+        if any(ext in file_url.lower() for ext in [".jpg", ".jpeg", ".png", ".webp", ".gif"]):
+            log_entries.append(
+                f'\n{indentedLoggingCSSHeader} style="background-color: {color};">'
+                f'<img src="{file_url}" alt="{file_url}" class="embeddedImage" style="max-height: 50%; height: auto;" loading="lazy">'
+                f'</p>'
+            )
+        else:
+            log_entries.append(
+                f'\n<a href="{file_url}" style="background-color: rgba(150, 200, 255, 0.2);">{file_url}</a>'
+            )
     if log_entries:
-        with open(logFilePath, 'a', encoding='utf-8') as logFile:
-            logFile.write(f"\n{' '.join(log_entries)}\n")
+        html += f"\n{' '.join(log_entries)}\n"
+    return html
+
+
+def readLogRecords(logPath: str):
+    """stream the records of a json lines chat log (or a gzipped segment of one), skipping any torn lines"""
+    opener = gzip.open if logPath.endswith(".gz") else open
+    with opener(logPath, 'rt', encoding='utf-8') as logFile:
+        for line in logFile:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def readChannelRecords(logPath: str, start: float = None, end: float = None):
+    """stream a channel's records in [start, end] across its rotated segments and active log, oldest first"""
+    paths = findLogSegments(logPath, start, end)
+    if os.path.isfile(logPath):
+        paths.append(logPath)
+
+    for path in paths:
+        for record in readLogRecords(path):
+            recordTime = record.get("time", 0)
+            if (start is None or recordTime >= start) and (end is None or recordTime <= end):
+                yield record
+
+
+LEGACY_ENTRY = re.compile(r'<p class="text" style="background-color: ([^"]*)">(.*?)<br /><br />')
+LEGACY_ATTACHMENT = re.compile(r'(?:<img src|<a href)="([^"]*)"')
+
+
+def readLegacyHtmlRecords(htmlPath: str):
+    """
+    stream records out of a <channel>.html log from before json lines. those kept no ids and only
+    whole-second times, so records carry time, author, bot, color, content and attachments only
+    """
+    with open(htmlPath, 'r', encoding='utf-8', errors='replace') as htmlFile:
+        text = htmlFile.read()
+
+    entries = list(LEGACY_ENTRY.finditer(text))
+    for i, entry in enumerate(entries):
+        body = text[entry.end():entries[i + 1].start() if i + 1 < len(entries) else len(text)]
+        end = body.rfind("<br /></p>")
+        if end == -1:
+            continue
+        try:
+            recordTime = calendar.timegm(time.strptime(entry.group(2), "%a, %d %b %Y %H:%M:%S +0000"))
+        except ValueError:
+            continue
+
+        author, _, content = body[:end].partition(": ")
+        yield {
+            "time": recordTime,
+            "author": author,
+            "bot": author == "CINNAMON (bot)",
+            "color": entry.group(1),
+            "content": content,
+            "attachments": LEGACY_ATTACHMENT.findall(body[end:]),
+        }
+
+
+RENDERED_HTML_SUFFIX = ".rendered.html"
+
+def renderLogToHtml(logPath: str, htmlPath: str = None) -> str:
+    """
+    render a channel's whole chat log, rotated segments included, to <log>.rendered.html next to it (or at
+    htmlPath), so the plain <channel>.html logs from before json lines are never written over.
+    a single .gz segment renders just that segment. returns the html file's path
+    """
+    if htmlPath is None:
+        htmlPath = os.path.splitext(logPath[:-3] if logPath.endswith(".gz") else logPath)[0] + RENDERED_HTML_SUFFIX
+
+    records = readLogRecords(logPath) if logPath.endswith(".gz") else readChannelRecords(logPath)
+    tempPath = f"{htmlPath}.tmp"
+    with open(tempPath, 'w', encoding='utf-8') as htmlFile:
+        htmlFile.writelines(defaultLoggingHtml)
+        for record in records:
+            htmlFile.write(renderRecordHtml(record))
+    os.replace(tempPath, htmlPath)
+    return htmlPath
@@ -0,0 +1,151 @@
+# cinMatcher.py
+# compiled matchers for core dispatch. no cinIO/config imports here, so this stays importable from benchmarks
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+WILDCARD_PHRASE = "*"
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[PHRASES]
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over every bound phrase.
+
+    One pass over a message finds every phrase it contains; the handler returned is the one for
+    the phrase registered first, same as walking the phrases dict in order. "*" isn't part of
+    the automaton - it's a wildcard, and its handlers are kept separately to always run.
+    """
+
+    def __init__(self, phrases: Optional[Dict[str, Callable]] = None):
+        self.wildcards: List[Callable] = []
+        self._handlers: List[Callable] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # lowest phrase order that ends at this state, following fail links. -1 if none
+        self._best: List[int] = [-1]
+        self.rebuild(phrases or {})
+
+    def __len__(self):
+        return len(self._handlers)
+
+    def rebuild(self, phrases: Dict[str, Callable]):
+        """(re)compile the automaton from a {phrase: handler} dict, keeping its insertion order as priority"""
+        wildcards = []
+        handlers = []
+        goto = [{}]
+        best = [-1]
+
+        for phrase, func in phrases.items():
+            if phrase == WILDCARD_PHRASE:
+                wildcards.append(func)
+                continue
+            if not phrase:
+                continue
+
+            order = len(handlers)
+            handlers.append(func)
+
+            state = 0
+            for char in phrase:
+                nextState = goto[state].get(char)
+                if nextState is None:
+                    nextState = len(goto)
+                    goto[state][char] = nextState
+                    goto.append({})
+                    best.append(-1)
+                state = nextState
+            if best[state] == -1:
+                best[state] = order
+
+        # breadth-first over the trie to fill in fail links
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nextState in goto[state].items():
+                queue.append(nextState)
+
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(char, 0)
+                fail[nextState] = target if target != nextState else 0
+
+                inherited = best[fail[nextState]]
+                if inherited != -1 and (best[nextState] == -1 or inherited < best[nextState]):
+                    best[nextState] = inherited
+
+        # swap everything in at once, so a message being matched mid-rebuild never sees half an automaton
+        self.wildcards, self._handlers, self._goto, self._fail, self._best = wildcards, handlers, goto, fail, best
+
+    def first_match(self, text: str) -> Optional[Tuple[int, Callable]]:
+        """(order, handler) for the earliest-registered phrase found anywhere in text, or None"""
+        goto, fail, best = self._goto, self._fail, self._best
+        if len(goto) == 1:
+            return None
+
+        state = 0
+        found = -1
+        for char in text:
+            nextState = goto[state].get(char)
+            while nextState is None and state:
+                state = fail[state]
+                nextState = goto[state].get(char)
+            state = nextState or 0
+
+            order = best[state]
+            if order != -1 and (found == -1 or order < found):
+                found = order
+                if found == 0:
+                    break  # can't do better than the first phrase
+
+        if found == -1:
+            return None
+        return found, self._handlers[found]
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[COMMANDS]
+
+class CommandTable:
+    """
+    Normalized {command: handler} lookup for prefixed messages.
+
+    Only the prefix and the first token are ever read: the token scan stops at whitespace or one
+    character past the longest known command, so a huge pasted "!>..." costs the same as a short one.
+    """
+
+    def __init__(self, prefix: str, commands: Optional[Dict[str, Callable]] = None):
+        self.prefix = prefix
+        self._table: Dict[str, Callable] = {}
+        self._maxLength = 0
+        self.rebuild(commands or {})
+
+    def __len__(self):
+        return len(self._table)
+
+    def rebuild(self, commands: Dict[str, Callable]):
+        """(re)build the table from a {command: handler} dict. names are normalized once, here"""
+        table = {}
+        for name, func in commands.items():
+            table.setdefault(name.lower(), func)
+        self._table = table
+        self._maxLength = max((len(name) for name in table), default=0)
+
+    def lookup(self, content: str) -> Optional[Tuple[str, Callable]]:
+        """(command, handler) if content is a known prefixed command, else None"""
+        if not content.startswith(self.prefix):
+            return None
+
+        start = len(self.prefix)
+        limit = min(len(content), start + self._maxLength + 1)
+        end = start
+        while end < limit and not content[end].isspace():
+            end += 1
+
+        if end - start > self._maxLength:
+            return None  # longer than anything registered
+
+        command = content[start:end].lower()
+        func = self._table.get(command)
+        if func is None:
+            return None
+        return command, func
@@ -0,0 +1,242 @@
+# cinMetrics.py
+# per-handler call counts, errors and latency histograms, plus a few process gauges.
+# viewable with !>stats (plugins/diagnostics) and, if enabled, as prometheus text over http
+import asyncio
+import bisect
+import functools
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cinAPI
+import cinLogging
+from cinIO import config
+
+logger = cinLogging.getLogger(__name__)
+metricsConfig = config.get("metrics", {})
+
+# upper bounds in seconds, prometheus style. anything slower lands in the implicit +Inf bucket
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[HISTOGRAMS]
+
+class Histogram:
+    """fixed-bucket latency histogram. constant memory however many observations, percentiles are interpolated"""
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p: float) -> float:
+        """estimated p-th percentile (0-100), 0 if nothing was observed"""
+        if not self.count:
+            return 0.0
+        rank = self.count * p / 100
+        seen = 0
+        for i, bucketCount in enumerate(self.counts):
+            if bucketCount and seen + bucketCount >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / bucketCount, self.max)
+            seen += bucketCount
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+
+class HandlerMetrics:
+    def __init__(self, kind: str, name: str, plugin: str):
+        self.kind = kind
+        self.name = name
+        self.plugin = plugin
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.latency = Histogram()
+
+    def observe(self, seconds: float, failed: bool, timedOut: bool = False):
+        self.calls += 1
+        if failed:
+            self.errors += 1
+        if timedOut:
+            self.timeouts += 1
+        self.latency.observe(seconds)
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[REGISTRY]
+
+async def timedCall(metrics: HandlerMetrics, func: Callable, args: tuple):
+    start = time.perf_counter()
+    failed = True
+    try:
+        result = await func(*args)
+        failed = False
+        return result
+    finally:
+        metrics.observe(time.perf_counter() - start, failed)
+
+# any frame running this code has the HandlerMetrics of the handler it's running in its locals (cinWatchdog uses it)
+TIMED_CODE = timedCall.__code__
+
+
+class MetricsRegistry:
+    """
+    Everything is updated from the event loop thread only, so there's no locking. Handlers are keyed by
+    (kind, name), where kind is the plugin component they came from: commands, phrases, reactions or loops,
+    or "events" for the cinAPI event handlers the clients dispatch to (bot.py's handleCommand and co).
+    """
+
+    def __init__(self):
+        self.handlers: Dict[Tuple[str, str], HandlerMetrics] = {}
+        self.loopTick = Histogram()
+        self.gauges: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self.startTime = time.time()
+
+    def handler(self, kind: str, name: str, plugin: str) -> HandlerMetrics:
+        metrics = self.handlers.get((kind, name))
+        if metrics is None:
+            metrics = self.handlers[(kind, name)] = HandlerMetrics(kind, name, plugin)
+        return metrics
+
+    def wrap(self, kind: str, name: str, plugin: str, func: Callable) -> Callable:
+        """func, timed into this registry. keeps func's signature, so validate_handler still sees the original"""
+        metrics = self.handler(kind, name, plugin)
+
+        @functools.wraps(func)
+        async def timed(*args):
+            return await timedCall(metrics, func, args)
+
+        return timed
+
+    def observeEvent(self, eventType: str, name: str, seconds: float, outcome: str):
+        """cinAPI's handler observer: event handler calls land here, next to the plugin handlers"""
+        module = name.rsplit(".", 1)[0]
+        plugin = module.split(".")[1] if module.startswith("plugins.") else "core"
+        self.handler("events", f"{eventType}:{name}", plugin).observe(seconds, outcome != "ok", outcome == "timeout")
+
+    def addGauge(self, name: str, read: Callable[[], Dict[str, float]]):
+        """read() -> {label value: reading}, called whenever metrics are viewed"""
+        self.gauges[name] = read
+
+    def readGauges(self) -> Dict[str, Dict[str, float]]:
+        readings = {}
+        for name, read in self.gauges.items():
+            try:
+                readings[name] = read()
+            except Exception as e:
+                logger.warning("gauge %s failed: %s", name, e)
+        return readings
+
+    def slowest(self, count: int = 10) -> List[HandlerMetrics]:
+        """handlers that have cost the most time in total, most first"""
+        return sorted(self.handlers.values(), key=lambda m: m.latency.sum, reverse=True)[:count]
+
+
+def eventQueueDepths() -> Dict[str, float]:
+    return {
+        name: client.event_queue_depth()
+        for name, client in cinAPI.get_all_clients().items()
+        if hasattr(client, "event_queue_depth")
+    }
+
+
+registry = MetricsRegistry()
+registry.addGauge("event_queue_depth", eventQueueDepths)
+cinAPI.set_handler_observer(registry.observeEvent)
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[PROMETHEUS]
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _histogramLines(metricName: str, histogram: Histogram, labels: dict) -> List[str]:
+    lines = []
+    cumulative = 0
+    for bound, bucketCount in zip(histogram.bounds + (float("inf"),), histogram.counts):
+        cumulative += bucketCount
+        le = "+Inf" if bound == float("inf") else repr(bound)
+        lines.append(f"{metricName}_bucket{_labels(**labels, le=le)} {cumulative}")
+    lines.append(f"{metricName}_sum{_labels(**labels)} {histogram.sum}")
+    lines.append(f"{metricName}_count{_labels(**labels)} {histogram.count}")
+    return lines
+
+
+def renderPrometheus(metrics: MetricsRegistry = registry) -> str:
+    """the whole registry in prometheus text exposition format"""
+    lines = [
+        "# TYPE cinnamon_handler_calls_total counter",
+        *(f"cinnamon_handler_calls_total{_labels(kind=m.kind, name=m.name, plugin=m.plugin)} {m.calls}"
+          for m in metrics.handlers.values()),
+        "# TYPE cinnamon_handler_errors_total counter",
+        *(f"cinnamon_handler_errors_total{_labels(kind=m.kind, name=m.name, plugin=m.plugin)} {m.errors}"
+          for m in metrics.handlers.values()),
+        "# TYPE cinnamon_handler_timeouts_total counter",
+        *(f"cinnamon_handler_timeouts_total{_labels(kind=m.kind, name=m.name, plugin=m.plugin)} {m.timeouts}"
+          for m in metrics.handlers.values()),
+        "# TYPE cinnamon_handler_seconds histogram",
+    ]
+    for m in metrics.handlers.values():
+        lines.extend(_histogramLines("cinnamon_handler_seconds", m.latency, {"kind": m.kind, "name": m.name, "plugin": m.plugin}))
+
+    lines.append("# TYPE cinnamon_loop_tick_seconds histogram")
+    lines.extend(_histogramLines("cinnamon_loop_tick_seconds", metrics.loopTick, {}))
+
+    for name, readings in metrics.readGauges().items():
+        lines.append(f"# TYPE cinnamon_{name} gauge")
+        lines.extend(f"cinnamon_{name}{_labels(client=label)} {value}" for label, value in readings.items())
+
+    lines.append("# TYPE cinnamon_uptime_seconds gauge")
+    lines.append(f"cinnamon_uptime_seconds {time.time() - metrics.startTime:.0f}")
+    return "\n".join(lines) + "\n"
+
+
+async def _serveMetrics(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        requestLine = await asyncio.wait_for(reader.readline(), timeout=5)
+        path = requestLine.decode("latin-1").split(" ")[1] if requestLine.count(b" ") >= 2 else ""
+        if path.split("?")[0] in ("/", "/metrics"):
+            status, body = "200 OK", renderPrometheus().encode()
+        else:
+            status, body = "404 Not Found", b"not found\n"
+        writer.write(
+            f"HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+metricsServer: Optional[asyncio.AbstractServer] = None
+
+async def startMetricsServer() -> Optional[asyncio.AbstractServer]:
+    """serve /metrics if metrics.serve is on. binds to localhost unless the config says otherwise"""
+    global metricsServer
+    if metricsServer is not None or not metricsConfig.get("serve", False):
+        return None
+    host = metricsConfig.get("host", "127.0.0.1")
+    port = metricsConfig.get("port", 9108)
+    try:
+        metricsServer = await asyncio.start_server(_serveMetrics, host, port)
+    except OSError as e:
+        logger.error("couldn't serve metrics on %s:%s: %s", host, port, e)
+        return None
+    logger.info("serving metrics on http://%s:%s/metrics", host, port)
+    return metricsServer
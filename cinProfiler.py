@@ -0,0 +1,190 @@
+# cinProfiler.py
+# sampling profiler for the live bot. a thread samples the event loop thread's stack, so nothing is instrumented
+# and the loop never notices. output is collapsed stacks (flamegraph.pl / speedscope / inferno all read them)
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import cinLogging
+from cinIO import cachePath, config, ensureDirs
+
+logger = cinLogging.getLogger(__name__)
+profilerConfig = config.get("profiler", {})
+profilesPath = os.path.join(cachePath, "profiles")
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[SAMPLING]
+
+def frameLabel(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def collapseStack(frame) -> str:
+    """root-first, ;-joined labels for a frame and its callers"""
+    labels = []
+    while frame is not None:
+        labels.append(frameLabel(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's stack every interval seconds from a background thread. Costs the profiled thread
+    nothing but the GIL handoffs, so it's fine to run against production for a minute or two.
+    """
+
+    def __init__(self, threadID: int, interval: float = 0.005):
+        self.threadID = threadID
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="cinProfiler_sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.threadID)
+            if frame is None:
+                continue
+            self.stacks[collapseStack(frame)] += 1
+            self.samples += 1
+            del frame
+
+    def writeCollapsed(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def topFrames(self, count: int = 10) -> List[Tuple[str, int]]:
+        """(frame, samples) for the frames most often on top of the stack, i.e. where the time actually went"""
+        selfTime = Counter()
+        for stack, samples in self.stacks.items():
+            selfTime[stack.rsplit(";", 1)[-1]] += samples
+        return selfTime.most_common(count)
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[SLOW CALLBACKS]
+
+class SlowCallbackRecorder(logging.Handler):
+    """
+    Catches asyncio's own "Executing <Handle> took N seconds" debug-mode warnings, which it logs for every
+    callback that ran longer than loop.slow_callback_duration
+    """
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.callbacks: List[Tuple[float, str]] = []
+
+    def emit(self, record: logging.LogRecord):
+        # msg can be anything logging accepts, not just a format string
+        if isinstance(record.msg, str) and record.msg.startswith("Executing") and len(record.args or ()) == 2:
+            handle, seconds = record.args
+            self.callbacks.append((seconds, str(handle)))
+
+    def slowest(self, count: int = 10) -> List[Tuple[float, str]]:
+        return sorted(self.callbacks, reverse=True)[:count]
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[PROFILE RUNS]
+
+@dataclass
+class ProfileResult:
+    path: str
+    seconds: float
+    samples: int
+    topFrames: List[Tuple[str, int]] = field(default_factory=list)
+    slowCallbacks: List[Tuple[float, str]] = field(default_factory=list)
+
+    def summary(self, rows: int = 8) -> str:
+        lines = [f"profiled {self.seconds:.1f}s, {self.samples} samples -> {os.path.basename(self.path)}", "",
+                 "top frames (% of samples):"]
+        for frame, samples in self.topFrames[:rows]:
+            lines.append(f"  {samples * 100 / max(1, self.samples):5.1f}%  {frame}")
+        lines.append("")
+        lines.append(f"slow callbacks ({len(self.slowCallbacks)} over threshold):")
+        for seconds, handle in self.slowCallbacks[:rows]:
+            lines.append(f"  {seconds * 1000:7.1f}ms  {handle[:120]}")
+        return "\n".join(lines)
+
+
+_running = asyncio.Lock()
+_stopRequest: Optional[asyncio.Event] = None  # set to end the current run early
+
+def isProfiling() -> bool:
+    return _running.locked()
+
+
+def stopProfiling() -> bool:
+    """end the current run now (it still writes its profile). False if nothing's running"""
+    if _stopRequest is None or not isProfiling():
+        return False
+    _stopRequest.set()
+    return True
+
+
+async def profileFor(seconds: float, interval: Optional[float] = None,
+                     slowCallbackSeconds: Optional[float] = None) -> ProfileResult:
+    """
+    Sample the event loop thread for seconds, with asyncio debug mode on to catch slow callbacks, then write
+    cache/profiles/profile-<time>.folded. One profile at a time; stopProfiling() ends it early. Debug mode is put
+    back how it was however the run ends, cancelled included.
+    """
+    global _stopRequest
+    interval = interval or profilerConfig.get("intervalMs", 5) / 1000
+    slowCallbackSeconds = slowCallbackSeconds or profilerConfig.get("slowCallbackMs", 100) / 1000
+
+    async with _running:
+        loop = asyncio.get_running_loop()
+        wasDebug, oldThreshold = loop.get_debug(), loop.slow_callback_duration
+        recorder = SlowCallbackRecorder()
+        asyncioLogger = logging.getLogger("asyncio")
+        asyncioLogger.addHandler(recorder)
+        loop.set_debug(True)
+        loop.slow_callback_duration = slowCallbackSeconds
+
+        profiler = SamplingProfiler(threading.get_ident(), interval)
+        _stopRequest = asyncio.Event()
+        started = time.monotonic()
+        profiler.start()
+        try:
+            await asyncio.wait_for(_stopRequest.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass  # ran the whole window
+        finally:
+            # put the loop back before anything else can be interrupted
+            loop.set_debug(wasDebug)
+            loop.slow_callback_duration = oldThreshold
+            asyncioLogger.removeHandler(recorder)
+            _stopRequest = None
+            await asyncio.to_thread(profiler.stop)
+
+        ensureDirs([profilesPath])
+        path = os.path.join(profilesPath, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        await asyncio.to_thread(profiler.writeCollapsed, path)
+
+    result = ProfileResult(path, time.monotonic() - started, profiler.samples, profiler.topFrames(),
+                           recorder.slowest())
+    logger.info("wrote profile %s (%d samples)", path, profiler.samples)
+    return result
+
+
+async def profileOnStartup():
+    """profiler.onStartupSeconds in the config profiles the first N seconds after the bot starts"""
+    seconds = profilerConfig.get("onStartupSeconds", 0)
+    if seconds > 0:
+        result = await profileFor(seconds)
+        logger.info("startup profile:\n%s", result.summary())
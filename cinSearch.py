@@ -0,0 +1,171 @@
+# cinSearch.py
+# full-text index over the chat logs, fed from cinLogging.logMessage. sqlite FTS5, in its own database
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Collection, Iterable, List, Optional
+
+import cinLogging
+from cinIO import cachePath, config
+
+logger = cinLogging.getLogger(__name__)
+searchConfig = config.get("search", {})
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[INDEX]
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS messages ("
+    "id INTEGER PRIMARY KEY, time REAL NOT NULL, guild_id INTEGER, channel_id INTEGER, channel TEXT, "
+    "author_id INTEGER, author TEXT, content TEXT NOT NULL, "
+    "UNIQUE (channel_id, time, author_id))",
+    "CREATE INDEX IF NOT EXISTS messages_channel_time ON messages (channel_id, time)",
+    "CREATE INDEX IF NOT EXISTS messages_guild_time ON messages (guild_id, time)",
+    # external content table: the text is stored once, in messages, and the trigger keeps the index in step
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, content='messages', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN "
+    "INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content); END",
+]
+
+INSERT_SQL = (
+    "INSERT OR IGNORE INTO messages (time, guild_id, channel_id, channel, author_id, author, content) "
+    "VALUES (:time, :guild_id, :channel_id, :channel, :author_id, :author, :content)"
+)
+
+
+def ftsQuery(terms: List[str]) -> str:
+    """quote every term, so user input is always matched as words and never parsed as fts syntax"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+class SearchIndex:
+    """
+    Incremental FTS5 index of logged messages.
+
+    add() only queues a record; a background thread inserts them in batches every batchSeconds.
+    search() reads on its own connection (WAL), so it never waits on the indexer. Re-indexing a message
+    that's already there is a no-op, which is what lets the backfill overlap with live logging.
+    """
+
+    def __init__(self, dbPath: str, batchSeconds: float = 1.0):
+        self.dbPath = dbPath
+        self.batchSeconds = batchSeconds
+        self._queue = queue.Queue()
+        self._thread = None
+        self._startLock = threading.Lock()
+        self._readConnection = None
+
+    def connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.dbPath, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    def add(self, record: dict):
+        if not record.get("content"):
+            return
+        if self._thread is None:
+            self._start()
+        self._queue.put(record)
+
+    def flush(self, timeout: float = 5.0):
+        """block until everything queued so far is indexed"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def indexRecords(self, connection: sqlite3.Connection, records: Iterable[dict]) -> int:
+        """insert records in one transaction, returns how many were new"""
+        rows = [
+            {key: record.get(key) for key in ("time", "guild_id", "channel_id", "channel", "author_id", "author")}
+            | {"content": record["content"]}
+            for record in records if record.get("content")
+        ]
+        connection.execute("BEGIN")
+        try:
+            cursor = connection.executemany(INSERT_SQL, rows)
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        # rowcount counts the rows this statement inserted, not the fts writes its trigger makes
+        return max(cursor.rowcount, 0)
+
+    def search(self, terms: List[str], guildID: Optional[int] = None, channelID: Optional[int] = None,
+               channel: Optional[str] = None, author: Optional[str] = None, authorID: Optional[int] = None,
+               before: Optional[float] = None, after: Optional[float] = None, limit: int = 10,
+               channelIDs: Optional[Collection[int]] = None) -> List[dict]:
+        """
+        newest matching messages first. channel and author match names case-insensitively.
+        channelIDs, if given, is an allow-list: messages from any other channel are never returned
+        """
+        if channelIDs is not None and not channelIDs:
+            return []
+        if self._readConnection is None:
+            self._readConnection = self.connect()
+            self._readConnection.row_factory = sqlite3.Row
+
+        sql = ["SELECT m.time, m.guild_id, m.channel_id, m.channel, m.author_id, m.author, m.content "
+               "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid WHERE messages_fts MATCH ?"]
+        params = [ftsQuery(terms)]
+        for clause, value in (("m.guild_id = ?", guildID), ("m.channel_id = ?", channelID),
+                              ("m.channel = ? COLLATE NOCASE", channel),
+                              ("m.author_id = ?", authorID), ("m.author = ? COLLATE NOCASE", author),
+                              ("m.time < ?", before), ("m.time > ?", after)):
+            if value is not None:
+                sql.append(clause)
+                params.append(value)
+        if channelIDs is not None:
+            sql.append(f"m.channel_id IN ({', '.join('?' * len(channelIDs))})")
+            params.extend(channelIDs)
+        params.append(limit)
+
+        query = " AND ".join(sql) + " ORDER BY m.time DESC LIMIT ?"
+        return [dict(row) for row in self._readConnection.execute(query, params)]
+
+    def _start(self):
+        with self._startLock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="cinSearch_indexer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        connection = self.connect()
+        pending = []
+        lastFlush = time.monotonic()
+
+        while True:
+            timeout = max(0.0, self.batchSeconds - (time.monotonic() - lastFlush))
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            flushRequest = item if isinstance(item, threading.Event) else None
+            if isinstance(item, dict):
+                pending.append(item)
+
+            if flushRequest or time.monotonic() - lastFlush >= self.batchSeconds:
+                if pending:
+                    try:
+                        self.indexRecords(connection, pending)
+                    except sqlite3.Error as e:
+                        logger.error("failed to index %d messages: %s", len(pending), e)
+                    pending = []
+                lastFlush = time.monotonic()
+                if flushRequest:
+                    flushRequest.set()
+
+
+searchIndex = SearchIndex(
+    os.path.join(cachePath, searchConfig.get("dbPath", "search.db")),
+    batchSeconds=searchConfig.get("batchSeconds", 1.0)
+)
+cinLogging.addLogListener(searchIndex.add)
+atexit.register(searchIndex.flush)
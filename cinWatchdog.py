@@ -0,0 +1,157 @@
+# cinWatchdog.py
+# notices when the event loop stops ticking, grabs the loop thread's stack while it's still stuck, and blames
+# whichever plugin handler is on it. stalls are kept in a rolling report for !>stalls (plugins/diagnostics)
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+import cinLogging
+import cinMetrics
+from cinIO import config
+
+logger = cinLogging.getLogger(__name__)
+watchdogConfig = config.get("watchdog", {})
+pluginsPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plugins") + os.sep
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[ATTRIBUTION]
+
+def attribute(frame) -> Tuple[str, str]:
+    """
+    (plugin, handler) for a stack. A cinMetrics wrapper on the stack knows exactly which registered handler
+    is running; failing that, the innermost frame from a file under plugins/ names the plugin and function.
+    """
+    pluginFrame = None
+    while frame is not None:
+        if frame.f_code is cinMetrics.TIMED_CODE:
+            metrics = frame.f_locals.get("metrics")
+            if metrics is not None:
+                return metrics.plugin, f"{metrics.kind}:{metrics.name}"
+        if pluginFrame is None and frame.f_code.co_filename.startswith(pluginsPath):
+            pluginFrame = frame
+        frame = frame.f_back
+
+    if pluginFrame is None:
+        return "core", "?"
+    plugin = pluginFrame.f_code.co_filename[len(pluginsPath):].split(os.sep)[0]
+    return plugin, pluginFrame.f_code.co_name
+
+
+@dataclass
+class Stall:
+    started: float  # wall clock
+    plugin: str
+    handler: str
+    stack: List[str]
+    seconds: Optional[float] = None  # filled in once the loop comes back
+
+    def describe(self) -> str:
+        duration = f"{self.seconds * 1000:.0f}ms" if self.seconds is not None else "ongoing"
+        return f"{time.strftime('%H:%M:%S', time.localtime(self.started))} {duration:>8} {self.plugin} / {self.handler}"
+
+
+@dataclass
+class StallTotals:
+    count: int = 0
+    seconds: float = 0.0
+    worst: float = 0.0
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[WATCHDOG]
+
+class LoopWatchdog:
+    """
+    A heartbeat task stamps the time every interval; a thread checks the stamp. If the loop misses its beat by
+    more than threshold, the loop thread's stack is captured right then (while whatever is blocking is still
+    on it) and attributed. The heartbeat closes the stall with its real duration once the loop gets back.
+    """
+
+    def __init__(self, threshold: float = 0.25, interval: float = 0.05, keep: int = 50, stackDepth: int = 12):
+        self.threshold = threshold
+        self.interval = interval
+        self.stackDepth = stackDepth
+        self.stalls: Deque[Stall] = deque(maxlen=keep)
+        self.totals: Dict[Tuple[str, str], StallTotals] = {}
+
+        self._lastBeat = time.monotonic()
+        self._open: Optional[Stall] = None
+        self._lock = threading.Lock()
+        self._loopThreadID = None
+        self._heartbeat = None
+        self._thread = None
+
+    def start(self):
+        """call from the event loop"""
+        if self._thread is not None:
+            return
+        self._loopThreadID = threading.get_ident()
+        self._lastBeat = time.monotonic()
+        self._heartbeat = asyncio.create_task(self._beat(), name="watchdog_heartbeat")
+        self._thread = threading.Thread(target=self._watch, name="cinWatchdog", daemon=True)
+        self._thread.start()
+
+    async def _beat(self):
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                stall, self._open = self._open, None
+                lateBy = now - self._lastBeat - self.interval
+                self._lastBeat = now
+            if stall is not None:
+                self._close(stall, lateBy)
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if self._open is not None or time.monotonic() - self._lastBeat - self.interval < self.threshold:
+                    continue
+                frame = sys._current_frames().get(self._loopThreadID)
+                if frame is None:
+                    continue
+                plugin, handler = attribute(frame)
+                stack = traceback.format_stack(frame)[-self.stackDepth:]
+                del frame
+                self._open = Stall(time.time(), plugin, handler, stack)
+                self.stalls.append(self._open)
+
+    def _close(self, stall: Stall, seconds: float):
+        stall.seconds = seconds
+        totals = self.totals.setdefault((stall.plugin, stall.handler), StallTotals())
+        totals.count += 1
+        totals.seconds += seconds
+        totals.worst = max(totals.worst, seconds)
+        logger.warning("event loop blocked for %.0fms by %s / %s", seconds * 1000, stall.plugin, stall.handler)
+
+    def report(self, rows: int = 10) -> str:
+        """worst offenders by total blocked time, then the latest stall with its stack"""
+        if not self.stalls:
+            return f"no stalls over {self.threshold * 1000:.0f}ms"
+        lines = [f"{'plugin / handler':<40} {'stalls':>6} {'total ms':>9} {'worst ms':>9}"]
+        ranked = sorted(self.totals.items(), key=lambda item: item[1].seconds, reverse=True)[:rows]
+        for (plugin, handler), totals in ranked:
+            lines.append(f"{(plugin + ' / ' + handler)[:40]:<40} {totals.count:>6} "
+                         f"{totals.seconds * 1000:>9.0f} {totals.worst * 1000:>9.0f}")
+
+        latest = self.stalls[-1]
+        lines.append("")
+        lines.append(f"latest: {latest.describe()}")
+        lines.extend(line.rstrip() for line in "".join(latest.stack[-4:]).splitlines())
+        return "\n".join(lines)
+
+
+watchdog = LoopWatchdog(
+    threshold=watchdogConfig.get("thresholdMs", 250) / 1000,
+    interval=watchdogConfig.get("intervalMs", 50) / 1000,
+    keep=watchdogConfig.get("keep", 50)
+)
+
+
+def startWatchdog():
+    if watchdogConfig.get("enabled", True):
+        watchdog.start()
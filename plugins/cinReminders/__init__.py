@@ -6,18 +6,21 @@ import re
 import dateparser
 import cinIO
 #from bot import loopDelay, client
-from cinLogging import printErr
+import cinLogging
 
-from cinIO import config, overwriteCache, loadCache, userData
+from cinIO import config, openStorage, userData
 
 from cinAPI import CinAPIManager
 import cinAPI
+from plugins.cinReminders.delivery import ReminderDelivery
+from plugins.cinReminders.reminder_store import Reminder, ReminderStore, new_reminder_id
+from plugins.cinReminders.scheduler import ReminderScheduler
 
 api_manager = CinAPIManager()
+logger = cinLogging.getLogger(__name__)
 
-reminders = loadCache("reminders.json")
+reminders = ReminderStore(openStorage("reminders.json"))
 
-bigNumber = config["bigNumber"]
 relativeTimeRegex = r"([\d]+[hdmsMyY])"
 discordTimestampRegex = r"<t:(\d+):[DTRFdtrf]>"
 absoluteTimeRegex = r"@([\w:]+)"
@@ -41,22 +44,22 @@ def relativeTimeToSeconds(relativeTimes):
 def getTimeAndReminderText(message: cinAPI.APIMessage, args):
     try:
         timeDiff = cinIO.getOrCreateUserData(str(message.author.id))["timezone"] * 3600 - time.timezone
-        print(timeDiff)
+        logger.debug("timezone offset: %s", timeDiff)
 
         reminderText = " ".join(args[1:])  # Combine the reminder text
 
         # Find Discord timestamps in the arguments
         discordTimestamps = re.findall(discordTimestampRegex, args[0])
-        print(f"Discord timestamps: {discordTimestamps}")  # Debug statement
+        logger.debug("Discord timestamps: %s", discordTimestamps)
 
         # Find relative times in the arguments
         relativeTimesWithIndices = re.finditer(relativeTimeRegex, args[0])
         relativeTimes = [v.group() for v in relativeTimesWithIndices]
-        print(f"Relative times: {relativeTimes}")  # Debug statement
+        logger.debug("Relative times: %s", relativeTimes)
 
         # Find absolute times in the arguments
         absoluteTimes = re.findall(absoluteTimeRegex, args[0])
-        print(f"Absolute times: {absoluteTimes}")  # Debug statement
+        logger.debug("Absolute times: %s", absoluteTimes)
 
         totalReminderTime = None
         if len(discordTimestamps) > 0:
@@ -66,30 +69,24 @@ def getTimeAndReminderText(message: cinAPI.APIMessage, args):
         elif len(absoluteTimes) > 0:
             absoluteTime = dateparser.parse(" ".join(absoluteTimes))
             totalReminderTime = absoluteTime.timestamp()
-            print(totalReminderTime)
         else:
-            printErr("No valid time format found")
+            logger.warning("No valid time format found")
 
         isAbsoluteTime = len(discordTimestamps) > 0 or len(absoluteTimes) > 0
         isRelativeTime = len(relativeTimes) > 0
 
-        print(f"getTimeAndReminderText: {totalReminderTime}")
+        logger.debug("getTimeAndReminderText: %s", totalReminderTime)
         return [totalReminderTime, reminderText, isAbsoluteTime, isRelativeTime]
     except Exception as e:
-        printErr(f"Failed to get reminder time: \n{e}")
+        logger.exception("Failed to get reminder time: %s", e)
 
 async def newReminder(args, message: cinAPI.APIMessage):
-    thisReminder = {
-        "userIDs": [message.author.id],
-        "client_name": message.client_name  # Store the client name with the reminder
-    }
-    
     timeAndReminderText = ["0", "default"]
     timeAndReminderText[0], timeAndReminderText[1], isAbsoluteTime, isRelativeTime = getTimeAndReminderText(message, args)
 
     if timeAndReminderText[0] is None:
         message.channel.send("No valid time format found")
-        printErr("No valid time format found")
+        logger.warning("No valid time format found")
         return
 
     try:
@@ -104,13 +101,17 @@ async def newReminder(args, message: cinAPI.APIMessage):
             # is relative time - seconds from now
             thisTime = timeDiff + int(totalReminderTime)
         else:
-            printErr("No valid time format found")
+            logger.warning("No valid time format found")
             return
 
-        thisReminder.update({ # this is beautiful
-            "text": timeAndReminderText[1] or "default text :3",
-            "channelID": message.channel.id
-        })
+        thisReminder = Reminder(
+            id=new_reminder_id(),
+            time=thisTime,
+            text=timeAndReminderText[1] or "default text :3",
+            channelID=message.channel.id,
+            client_name=message.client_name,  # Store the client name with the reminder
+            userIDs=[message.author.id]
+        )
 
         messageText = (
             f"Set a reminder at <t:{thisTime}> (<t:{thisTime}:R>) for \n"
@@ -118,17 +119,17 @@ async def newReminder(args, message: cinAPI.APIMessage):
             f"-# react 👉 to this message to also be pinged"
         )
 
-        reminders[str(thisTime)] = thisReminder
-        overwriteCache("reminders.json", reminders)
+        reminders.add(thisReminder)
+        scheduler.schedule(thisReminder.id, thisReminder.time)
 
         await message.channel.send(messageText)
 
-        print(reminders[str(thisTime)])
+        logger.debug("set reminder %s", thisReminder)
 
         # todo: implement self pointy react in another way
         # await reminderMessage.add_reaction("👉") # we don't care if this works, but it goes in the try/catch anyway
     except Exception as e:
-        printErr(f"Failed to set reminder: {e}")
+        logger.exception("Failed to set reminder: %s", e)
 
 
 async def reminderCommand(message: cinAPI.APIMessage):
@@ -139,52 +140,37 @@ async def reminderCommand(message: cinAPI.APIMessage):
 
     await newReminder(args, message)
 
-def delReminderByTimestamp(timestamp):
-    del reminders[timestamp]
-    cinIO.overwriteCache("reminders.json", reminders)
+def reminderFireTime(reminderID):
+    reminder = reminders.get(reminderID)
+    return reminder.time if reminder else None
 
-def getReminderStatus():
-    checkingTime = time.time() + 1  # check 1 second ahead bc ping
-    closestReminderTime = bigNumber
 
-    keysToRemove = []
-    lateReminders = []
+def dueReminders(reminderIDs):
+    # these stay in the store until they're delivered, so a crash or a failed send never loses one
+    return [reminders.get(reminderID) for reminderID in reminderIDs if reminderID in reminders]
 
-    for key in reminders:
-        # todo: handle key isn't
-        thisReminderTime = int(round(float(key)))
-        if thisReminderTime < checkingTime:
-            keysToRemove.append(key)
-            lateReminders.append(reminders[key])
 
-        elif thisReminderTime - checkingTime < closestReminderTime:
-            closestReminderTime = thisReminderTime - checkingTime
+def reminderDelivered(reminder):
+    reminders.remove(reminder.id)
 
-    if len(keysToRemove) > 0:
-        for v in keysToRemove:
-            del reminders[v]
-        overwriteCache("reminders.json", reminders)
 
-    return [closestReminderTime, lateReminders]
+def reminderUndeliverable(reminder):
+    # nothing else will ever send it, so the log is where it can be recovered from
+    logger.error("couldn't deliver reminder %s (due %d, channel %s, users %s): %s",
+                 reminder.id, reminder.time, reminder.channelID, reminder.userIDs, reminder.text)
+    reminders.remove(reminder.id)
 
 
 def getUserReminders(userID, requireAuthor = False):
-    theseReminders = {
-        key: reminder
-        for key, reminder in reminders.items()
-        if isinstance(reminder.get("userIDs"), list) and ( # if is list and
-                reminder["userIDs"][0] == userID or # is author or
-                (userID in reminder["userIDs"] and not requireAuthor) # is in reminder and not requireAuthor
-        )
-    }
-    return theseReminders
+    # soonest first. backed by the per-user index, so this only ever looks at this user's reminders
+    return reminders.for_user(userID, requireAuthor)
 
 
 async def reminderMenu(message: cinAPI.APIMessage):
     # Use the client from the triggering message
     client = api_manager.get_client(message.client_name)
     if not client:
-        print(f"Client {message.client_name} not found")
+        logger.warning("Client %s not found", message.client_name)
         return
 
     minute = 60
@@ -193,19 +179,16 @@ async def reminderMenu(message: cinAPI.APIMessage):
     week = day * 7
 
     userID = message.author.id
-    myReminders = getUserReminders(userID, True)
-
-    # Sort reminders by time (assuming 'reminderTime' is a timestamp)
-    sortedReminders = sorted(myReminders.items(), key=lambda x: x[0])
+    sortedReminders = getUserReminders(userID, True)
 
     menuText = f"<@{userID}>'s reminders:"
     i = 0 # ima be honest ik there's a better way to do both of these at once but I'm writing this in python and this is faster than trying to find the right way
 
-    for reminderTime, reminderData in sortedReminders:
+    for reminder in sortedReminders:
+        reminderTime = reminder.time
         emoji_letter = f":regional_indicator_{chr(97 + i)}:"
-        reminderText = reminderData.get("text")
-        print(type(reminderTime))
-        durationSeconds = int(float(reminderTime)) - time.time()
+        reminderText = reminder.text
+        durationSeconds = reminderTime - time.time()
 
         durationStr = ""
         if durationSeconds >= week:
@@ -234,14 +217,13 @@ async def reminderMenu(message: cinAPI.APIMessage):
 
     for i in range(len(sortedReminders)): # code that breaks if it contains any
         emoji_letter = chr(127462 + i)
-        print(emoji_letter)
         await myMessage.add_reaction(emoji_letter)
 
 async def handleReminderMenuReaction(reaction: cinAPI.APIReaction, user: cinAPI.APIUser):
     # Get client from the reaction's message
     client = api_manager.get_client(reaction.message.client_name)
     if not client:
-        print(f"Client {reaction.message.client_name} not found")
+        logger.warning("Client %s not found", reaction.message.client_name)
         return
         
     i = ord(reaction.emoji) - ord('🇦')  # 0-25 for a-z regional indicators
@@ -258,74 +240,61 @@ async def handleReminderMenuReaction(reaction: cinAPI.APIReaction, user: cinAPI.
         await reaction.message.channel.send(f"<@{user.id}> not only would that not work, but if it did, it would delete your own reminder without telling you what it was")
         return
 
-    # Get the corresponding reminder data
+    # Get the corresponding reminder data- same list, same order as the menu was built from
     userID = user.id
-    myReminders = getUserReminders(userID)
-
+    sortedReminders = getUserReminders(userID, True)
 
-    if len(myReminders) < i + 1:
+    if len(sortedReminders) < i + 1:
         await reaction.message.channel.send(
-            f"Don't add your own emoji- \n`OOB err on index {i} for reminders of length {len(myReminders)}`")
-
-    # todo: understand this line
-    sortedReminders = sorted(myReminders.items(), key=lambda x: x[0])
-    reminderTime, reminderData = sortedReminders[i]
+            f"Don't add your own emoji- \n`OOB err on index {i} for reminders of length {len(sortedReminders)}`")
+        return
 
+    reminder = sortedReminders[i]
+    reminderTime = reminder.time
+    wasOnlyUser = len(reminder.userIDs) == 1
+    reminders.remove_user(reminder.id, userID)
 
-    if len(reminderData["userIDs"]) == 1:
-        delReminderByTimestamp(reminderTime)
-        await reaction.message.channel.send(f"Deleted reminder at <t:{reminderTime}:F> \nTo restore the reminder, use this command: \n`!>reminder <t:{reminderTime}:F> {reminderData['text']}`")
+    if wasOnlyUser:
+        await reaction.message.channel.send(f"Deleted reminder at <t:{reminderTime}:F> \nTo restore the reminder, use this command: \n`!>reminder <t:{reminderTime}:F> {reminder.text}`")
 
     else:
-        reminderData["userIDs"].remove(userID)
-        reminders[reminderTime] = reminderData
-        overwriteCache("reminders.json", reminders)
-
-        await reaction.message.channel.send(f"Removed you from a reminder at <t:{reminderTime}:F> \nTo restore the reminder, use this command: \n`!>reminder <t:{reminderTime}:F> {reminderData['text']}`")
+        await reaction.message.channel.send(f"Removed you from a reminder at <t:{reminderTime}:F> \nTo restore the reminder, use this command: \n`!>reminder <t:{reminderTime}:F> {reminder.text}`")
 
     await reaction.message.edit(content="> old reminder menu, `!>reminders` to re-open")
 
 
-async def checkForReminders() -> None:
-    # print("reminder loop...")
-    closestReminderTime, lateReminders = getReminderStatus()
+deliveryConfig = config.get("reminderDelivery", {})
+delivery = ReminderDelivery(
+    api_manager,
+    global_concurrency=deliveryConfig.get("globalConcurrency", 8),
+    channel_concurrency=deliveryConfig.get("channelConcurrency", 1),
+    max_attempts=deliveryConfig.get("maxAttempts", 4),
+    retry_backoff_seconds=deliveryConfig.get("retryBackoffSeconds", 2),
+    on_delivered=reminderDelivered,
+    on_failed=reminderUndeliverable
+)
 
-    for reminder in lateReminders:
-        if not (isinstance(reminder["userIDs"], list) and len(reminder["userIDs"]) > 0):
-            print("Missing users for reminder")
-            continue
 
-        client = api_manager.get_client(reminder.get("client_name", "discord"))
-        if not client:
-            print(f"Client {reminder.get('client_name')} not found for reminder")
-            continue
+async def fireReminders(keys) -> None:
+    # sends happen in the background, so a slow or retrying channel never holds up the scheduler
+    delivery.submit(dueReminders(keys))
 
-        author_id = reminder["userIDs"][0]
-        recipient = await client.get_user_by_id(author_id) # assume is DM if can't find channel
 
-        if reminder["text"]:
-            messageText = f'<@{author_id}> reminder: \n> {reminder["text"]}'
-        else:
-            messageText = f'<@{author_id}> reminder: \n> {"default text :3"}'
-
-        channel = await client.get_channel_by_id(reminder["channelID"])
-        if channel:
-            mentions = [f"<@{userID}>" for userID in reminder["userIDs"][1:]]
-            if mentions:
-                if len(mentions) > 50: mentions = mentions[:49]
-                messageText += "\n\n-# " + " ".join(mentions)
-            await channel.send(messageText)
-        else:
-            messageText += "react to snooze for 20m"
-            message = await recipient.send(messageText)
-            await message.add_reaction("👉")
+scheduler = ReminderScheduler(fireReminders, reminderFireTime)
+for reminder in reminders:
+    scheduler.schedule(reminder.id, reminder.time)
+
+
+async def checkForReminders() -> None:
+    # the scheduler sleeps until the next reminder is due on its own- the main loop just makes sure it's alive
+    scheduler.ensure_running()
 
 
 async def handleReminderReaction(reaction: cinAPI.APIReaction, user: cinAPI.APIUser = None):
     # Get client from the reaction's message
     client = api_manager.get_client(reaction.message.client_name)
     if not client:
-        print(f"Client {reaction.message.client_name} not found")
+        logger.warning("Client %s not found", reaction.message.client_name)
         return
         
     if not (reaction and reaction.message): return
@@ -340,7 +309,7 @@ async def handleReminderReaction(reaction: cinAPI.APIReaction, user: cinAPI.APIU
     if ">'s reminders:" in lowerContent:  # on user reaction to a reminder menu message sent by a bot
         if len(reaction.emoji) == 1 and '🇦' <= reaction.emoji[0] <= '🇿':  # with an alpha regional indicator emoji
             await handleReminderMenuReaction(reaction, user)
-    elif "-# react to this message to also be pinged" in lowerContent:
+    elif "to this message to also be pinged" in lowerContent:
         # Extract the reminder timestamp from the message content
         # Example format in message: "<t:timestamp>"
         start = message.content.find("<t:") + 3
@@ -349,24 +318,26 @@ async def handleReminderReaction(reaction: cinAPI.APIReaction, user: cinAPI.APIU
             return  # Invalid or malformed message
 
         try:
-            reminderTimeStr = message.content[start:end]
+            reminderTime = int(message.content[start:end])
         except ValueError:
             return  # Invalid timestamp
 
-        # Ensure the reminder exists
-        if reminderTimeStr not in reminders:
+        # Ensure the reminder exists- this channel's reminders at that time. message text doesn't carry the id,
+        # so if several were set for the same second here, the first one set wins
+        matches = [reminder for reminder in reminders.for_channel(message.channel.id) if reminder.time == reminderTime]
+        if not matches:
             await message.channel.send("Error: Could not find the associated reminder.")
             return
+        reminder = matches[0]
 
-        if user.id in reminders[reminderTimeStr]["userIDs"]:
+        if user.id in reminder.userIDs:
             addedOrRemoved = "removed"
-            reminders[reminderTimeStr]["userIDs"].remove(user.id)
+            reminders.remove_user(reminder.id, user.id)
         else:
             addedOrRemoved = "added"
-            reminders[reminderTimeStr]["userIDs"].append(user.id)
+            reminders.add_user(reminder.id, user.id)
 
         await message.channel.send(f"{user.mention}, you've been {addedOrRemoved} from the reminder!")
-        overwriteCache("reminders.json", reminders)
     elif "snooze" in lowerContent:
         # find line starting with "> ", get everything after the second character
         # make a reminder for this, for half an hour from now
@@ -0,0 +1,160 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from cinAPI import CinAPIManager, split_message
+from cinLogging import getLogger
+from plugins.cinReminders.reminder_store import Reminder
+
+logger = getLogger(__name__)
+
+MAX_MENTIONS = 49
+MESSAGE_LIMIT = 2000
+
+
+def reminder_message_text(reminder: Reminder) -> str:
+    return f'<@{reminder.author_id}> reminder: \n> {reminder.text or "default text :3"}'
+
+
+def mentions_text(reminder: Reminder) -> str:
+    mentions = [f"<@{userID}>" for userID in reminder.userIDs[1:MAX_MENTIONS + 1]]
+    return "\n\n-# " + " ".join(mentions) if mentions else ""
+
+
+def pack_messages(group: List[Reminder], limit: int = MESSAGE_LIMIT) -> List[Tuple[str, List[Reminder]]]:
+    """
+    (message, reminders it finishes) in send order: reminders merged up to limit, and one too long for a
+    single message split over several, so each send is exactly one message and can be retried on its own
+    """
+    messages = []
+    current, finished = "", []
+    for reminder in group:
+        text = reminder_message_text(reminder) + mentions_text(reminder)
+        if current and len(current) + 2 + len(text) <= limit:
+            current += "\n\n" + text
+            finished.append(reminder)
+            continue
+
+        if current:
+            messages.append((current, finished))
+        parts = split_message(text, limit)
+        messages.extend((part, []) for part in parts[:-1])
+        current, finished = parts[-1], [reminder]
+    if current:
+        messages.append((current, finished))
+    return messages
+
+
+class ReminderDelivery:
+    """
+    Sends due reminders concurrently, without letting a burst of them flood the client.
+
+    - reminders for the same channel are merged into as few messages as fit
+    - at most channel_concurrency sends per channel and global_concurrency sends overall are in flight
+    - each channel gets its own task, and each message retries with backoff on its own, so a retry never
+      re-sends what already went out and never holds up other channels
+    - on_delivered is called for each reminder once it's fully sent, on_failed for each one that can't be
+    """
+
+    def __init__(self, api_manager: CinAPIManager, global_concurrency: int = 8, channel_concurrency: int = 1,
+                 max_attempts: int = 4, retry_backoff_seconds: float = 2.0,
+                 on_delivered: Optional[Callable[[Reminder], None]] = None,
+                 on_failed: Optional[Callable[[Reminder], None]] = None):
+        self._api_manager = api_manager
+        self._global_limit = asyncio.Semaphore(global_concurrency)
+        self._channel_concurrency = channel_concurrency
+        self._channel_limits: Dict[Tuple[str, int], asyncio.Semaphore] = {}
+        self.max_attempts = max(1, max_attempts)
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.on_delivered = on_delivered or (lambda reminder: None)
+        self.on_failed = on_failed or (lambda reminder: None)
+        self._tasks: Set[asyncio.Task] = set()
+
+    def submit(self, reminders: List[Reminder]):
+        """start delivering reminders in the background and return right away"""
+        task = asyncio.create_task(self.deliver(reminders), name="reminder_delivery")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def deliver(self, reminders: List[Reminder]):
+        groups: Dict[Tuple[str, int], List[Reminder]] = {}
+        for reminder in reminders:
+            if not reminder.userIDs:
+                logger.warning("Missing users for reminder %s", reminder.id)
+                self.on_failed(reminder)
+                continue
+            groups.setdefault((reminder.client_name, reminder.channelID), []).append(reminder)
+
+        await asyncio.gather(*(self._deliver_group(key, group) for key, group in groups.items()))
+
+    async def _deliver_group(self, key: Tuple[str, int], group: List[Reminder]):
+        client_name, channel_id = key
+        pending = list(group)
+        try:
+            try:
+                client = self._api_manager.get_client(client_name)
+            except ValueError:
+                client = None
+            if not client:
+                logger.warning("Client %s not found for %d reminder(s)", client_name, len(group))
+                return
+
+            channel = await client.get_channel_by_id(channel_id)
+            if channel:
+                for text, finished in pack_messages(group):
+                    if not await self._send_with_retry(key, lambda: channel.send(text), f"channel {channel_id}"):
+                        return  # the rest would most likely fail the same way
+                    for reminder in finished:
+                        pending.remove(reminder)
+                        self.on_delivered(reminder)
+                return
+
+            # assume is DM if can't find channel
+            for reminder in group:
+                recipient = await client.get_user_by_id(reminder.author_id)
+                if not recipient:
+                    logger.warning("Couldn't find channel or user for reminder %s", reminder.id)
+                    continue
+                if await self._send_dm(key, recipient, reminder):
+                    pending.remove(reminder)
+                    self.on_delivered(reminder)
+        except Exception as e:
+            logger.exception("err delivering reminders to %s/%s: %s", client_name, channel_id, e)
+        finally:
+            for reminder in pending:
+                self.on_failed(reminder)
+
+    async def _send_dm(self, key: Tuple[str, int], recipient, reminder: Reminder) -> bool:
+        sent = []
+
+        async def send():
+            sent.append(await recipient.send(reminder_message_text(reminder) + "react to snooze for 20m"))
+
+        if not await self._send_with_retry(key, send, f"user {reminder.author_id}"):
+            return False
+        try:
+            if sent[-1]:
+                await sent[-1].add_reaction("👉")
+        except Exception as e:
+            # the reminder itself went out, so this isn't worth re-sending it over
+            logger.warning("couldn't add the snooze reaction for reminder %s: %s", reminder.id, e)
+        return True
+
+    async def _send_with_retry(self, key: Tuple[str, int], send: Callable[[], Awaitable], description: str) -> bool:
+        """True once send() goes through, False if it still fails after max_attempts"""
+        channelLimit = self._channel_limits.get(key)
+        if channelLimit is None:
+            channelLimit = self._channel_limits[key] = asyncio.Semaphore(self._channel_concurrency)
+
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                async with channelLimit, self._global_limit:
+                    await send()
+                return True
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    logger.error("giving up on reminder delivery to %s after %d attempts: %s", description, attempt, e)
+                    return False
+                # honour the client's rate limit hint if it gave one
+                delay = getattr(e, "retry_after", None) or self.retry_backoff_seconds * 2 ** (attempt - 1)
+                logger.warning("reminder delivery to %s failed (%s), retrying in %.1fs", description, e, delay)
+                await asyncio.sleep(delay)
@@ -0,0 +1,155 @@
+import uuid
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Set
+
+from cinIO import CacheStorage
+from cinLogging import getLogger
+
+logger = getLogger(__name__)
+
+
+@dataclass
+class Reminder:
+    id: str
+    time: int
+    text: str
+    channelID: int
+    client_name: str = "discord"
+    userIDs: List[int] = field(default_factory=list)  # author first, then anyone who asked to be pinged too
+
+    @property
+    def author_id(self) -> Optional[int]:
+        return self.userIDs[0] if self.userIDs else None
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        del data["id"]  # it's the storage key
+        return data
+
+    @classmethod
+    def from_dict(cls, reminderID: str, data: dict) -> "Reminder":
+        return cls(
+            id=reminderID,
+            time=int(data["time"]),
+            text=data.get("text", ""),
+            channelID=data.get("channelID"),
+            client_name=data.get("client_name", "discord"),
+            userIDs=list(data.get("userIDs", [])),
+        )
+
+
+def new_reminder_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+class ReminderStore:
+    """
+    Every reminder by its unique id, plus user id -> reminder ids and channel id -> reminder ids indexes.
+    All changes go through here so the indexes and storage never drift apart.
+    """
+
+    def __init__(self, storage: CacheStorage):
+        self._storage = storage
+        self._reminders: Dict[str, Reminder] = {}
+        self._by_user: Dict[int, Set[str]] = {}
+        self._by_channel: Dict[int, Set[str]] = {}
+
+        for key, data in storage.load().items():
+            try:
+                if "time" in data:
+                    reminder = Reminder.from_dict(key, data)
+                else:
+                    # pre-id format, keyed by fire time. rekey it so it can't collide anymore
+                    reminder = Reminder.from_dict(new_reminder_id(), {**data, "time": int(round(float(key)))})
+                    storage.delete(key)
+                    storage.set(reminder.id, reminder.to_dict())
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error("skipping unreadable reminder %s: %s", key, e)
+                continue
+            self._index(reminder)
+
+    def __len__(self):
+        return len(self._reminders)
+
+    def __contains__(self, reminderID: str):
+        return reminderID in self._reminders
+
+    def __iter__(self):
+        return iter(list(self._reminders.values()))
+
+    # ---------- indexes
+
+    def _index(self, reminder: Reminder):
+        self._reminders[reminder.id] = reminder
+        for userID in reminder.userIDs:
+            self._by_user.setdefault(userID, set()).add(reminder.id)
+        self._by_channel.setdefault(reminder.channelID, set()).add(reminder.id)
+
+    def _unindex(self, reminder: Reminder):
+        self._reminders.pop(reminder.id, None)
+        for userID in reminder.userIDs:
+            self._discard(self._by_user, userID, reminder.id)
+        self._discard(self._by_channel, reminder.channelID, reminder.id)
+
+    @staticmethod
+    def _discard(index: Dict[int, Set[str]], indexKey, reminderID: str):
+        ids = index.get(indexKey)
+        if ids is None:
+            return
+        ids.discard(reminderID)
+        if not ids:
+            del index[indexKey]
+
+    # ---------- reads
+
+    def get(self, reminderID: str) -> Optional[Reminder]:
+        return self._reminders.get(reminderID)
+
+    def for_user(self, userID: int, require_author: bool = False) -> List[Reminder]:
+        """this user's reminders, soonest first. require_author leaves out ones they're only pinged on"""
+        reminders = (self._reminders[reminderID] for reminderID in self._by_user.get(userID, ()))
+        if require_author:
+            reminders = (reminder for reminder in reminders if reminder.author_id == userID)
+        return sorted(reminders, key=lambda reminder: (reminder.time, reminder.id))
+
+    def for_channel(self, channelID: int) -> List[Reminder]:
+        return sorted((self._reminders[reminderID] for reminderID in self._by_channel.get(channelID, ())),
+                      key=lambda reminder: (reminder.time, reminder.id))
+
+    # ---------- writes
+
+    def add(self, reminder: Reminder):
+        if reminder.id in self._reminders:
+            raise ValueError(f"reminder {reminder.id} already exists")
+        self._index(reminder)
+        self._storage.set(reminder.id, reminder.to_dict())
+
+    def remove(self, reminderID: str) -> Optional[Reminder]:
+        reminder = self._reminders.get(reminderID)
+        if reminder is None:
+            return None
+        self._unindex(reminder)
+        self._storage.delete(reminderID)
+        return reminder
+
+    def add_user(self, reminderID: str, userID: int) -> bool:
+        reminder = self._reminders[reminderID]
+        if userID in reminder.userIDs:
+            return False
+        reminder.userIDs.append(userID)
+        self._by_user.setdefault(userID, set()).add(reminderID)
+        self._storage.set(reminderID, reminder.to_dict())
+        return True
+
+    def remove_user(self, reminderID: str, userID: int) -> bool:
+        """take a user off a reminder, deleting it if nobody's left on it"""
+        reminder = self._reminders[reminderID]
+        if userID not in reminder.userIDs:
+            return False
+        if len(reminder.userIDs) == 1:
+            self.remove(reminderID)
+            return True
+        reminder.userIDs.remove(userID)
+        self._discard(self._by_user, userID, reminderID)
+        self._storage.set(reminderID, reminder.to_dict())
+        return True
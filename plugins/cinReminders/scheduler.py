@@ -0,0 +1,81 @@
+import asyncio
+import heapq
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from cinLogging import getLogger
+
+logger = getLogger(__name__)
+
+
+class ReminderScheduler:
+    """
+    Fires reminders off of a min-heap of (fire time, key), sleeping until the next deadline instead of polling.
+
+    Removing a reminder doesn't touch the heap: entries are checked against get_fire_time when they come up,
+    and dropped if the reminder is gone or has moved.
+    """
+
+    def __init__(self, fire: Callable[[List[str]], Awaitable[None]],
+                 get_fire_time: Callable[[str], Optional[float]], lookahead: float = 1.0):
+        """
+        fire: called with every due key, once they're due
+        get_fire_time: the current fire time for a key, or None if it no longer exists
+        lookahead: fire this many seconds early, to make up for send latency
+        """
+        self._fire = fire
+        self._get_fire_time = get_fire_time
+        self.lookahead = lookahead
+        self._heap = []
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, key: str, fire_time: float):
+        """O(log n). wakes the scheduler early if this is now the soonest reminder"""
+        is_soonest = not self._heap or fire_time < self._heap[0][0]
+        heapq.heappush(self._heap, (fire_time, key))
+        if is_soonest:
+            self._wake.set()
+
+    def ensure_running(self):
+        """start the scheduler task if it isn't already running. needs a running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="reminder_scheduler")
+
+    def _pop_due(self) -> List[str]:
+        due = []
+        now = time.time() + self.lookahead
+        while self._heap and self._heap[0][0] <= now:
+            fire_time, key = heapq.heappop(self._heap)
+            if key not in due and self._get_fire_time(key) == fire_time:
+                due.append(key)
+        return due
+
+    def _drop_stale_head(self):
+        while self._heap and self._get_fire_time(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            due = self._pop_due()
+            if due:
+                try:
+                    await self._fire(due)
+                except Exception as e:
+                    logger.exception("err firing reminders: %s", e)
+                continue
+
+            self._drop_stale_head()
+            if self._heap:
+                delay = self._heap[0][0] - self.lookahead - time.time()
+            else:
+                delay = None  # nothing scheduled, sleep until something is
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,94 @@
+import cinAPI
+import cinMetrics
+import cinProfiler
+import cinWatchdog
+from cinIO import config
+
+adminGuild = config["adminGuild"]
+STATS_ROWS = 15
+max_profile_seconds = config.get("profiler", {}).get("maxSeconds", 120)
+
+
+def is_admin_message(message: cinAPI.APIMessage) -> bool:
+    return message.guild is not None and message.guild.id == adminGuild
+
+
+def format_ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}"
+
+
+def stats_text(registry: cinMetrics.MetricsRegistry, rows: int = STATS_ROWS) -> str:
+    lines = [f"{'handler':<28} {'calls':>7} {'errs':>5} {'p50':>7} {'p95':>7} {'p99':>7} {'total s':>8}"]
+    for m in registry.slowest(rows):
+        lines.append(
+            f"{(m.kind[0] + ':' + m.name)[:28]:<28} {m.calls:>7} {m.errors:>5} "
+            f"{format_ms(m.latency.percentile(50)):>7} {format_ms(m.latency.percentile(95)):>7} "
+            f"{format_ms(m.latency.percentile(99)):>7} {m.latency.sum:>8.2f}"
+        )
+
+    tick = registry.loopTick
+    lines.append("")
+    lines.append(f"loop tick (ms): p50 {format_ms(tick.percentile(50))}, p95 {format_ms(tick.percentile(95))}, "
+                 f"max {format_ms(tick.max)} over {tick.count} ticks")
+    for name, readings in registry.readGauges().items():
+        lines.append(f"{name}: " + (", ".join(f"{label} {value}" for label, value in readings.items()) or "-"))
+    return "```\n" + "\n".join(lines) + "\n```"
+
+
+async def stats_command(message: cinAPI.APIMessage):
+    if not is_admin_message(message):
+        return
+    await message.channel.send(stats_text(cinMetrics.registry))
+
+
+async def profile_command(message: cinAPI.APIMessage):
+    if not is_admin_message(message):
+        return
+    words = message.content.split()
+    if len(words) > 1 and words[1].lower() == "stop":
+        stopped = cinProfiler.stopProfiling()
+        await message.channel.send("stopping, results coming up" if stopped else "not profiling right now")
+        return
+    try:
+        seconds = float(words[1]) if len(words) > 1 else 10.0
+    except ValueError:
+        await message.channel.send("Usage: `!>profile <seconds>` or `!>profile stop`")
+        return
+    if not 0 < seconds <= max_profile_seconds:
+        await message.channel.send(f"profile for between 0 and {max_profile_seconds} seconds")
+        return
+    if cinProfiler.isProfiling():
+        await message.channel.send("already profiling, wait for that one to finish or `!>profile stop` it")
+        return
+
+    await message.channel.send(f"profiling for {seconds:g}s...")
+    result = await cinProfiler.profileFor(seconds)
+    await message.channel.send("```\n" + result.summary()[:1900] + "\n```")
+
+
+async def stalls_command(message: cinAPI.APIMessage):
+    if not is_admin_message(message):
+        return
+    await message.channel.send("```\n" + cinWatchdog.watchdog.report()[:1900] + "\n```")
+
+
+def bind_commands():
+    return {
+        "stats": stats_command,
+        "profile": profile_command,
+        "stalls": stalls_command
+    }
+
+def bind_help():
+    return {
+        "stats": "Admin server only. Shows the handlers that have taken the most time in total (plugin handlers, and "
+        "`e:` for the event handlers clients dispatch to), with call and error counts and p50/p95/p99 latency in ms, "
+        "plus loop tick times and event queue depths.\n"
+        "Usage: `!>stats`",
+        "profile": "Admin server only. Samples the running bot for a while and posts where the time went, plus any "
+        "event loop callbacks that blocked for too long. The full collapsed stacks (for flamegraphs) go in cache/profiles/.\n"
+        "Usage: `!>profile <seconds>` (default 10), `!>profile stop` to end a run early",
+        "stalls": "Admin server only. Lists the plugin handlers that have blocked the event loop the longest, with "
+        "the stack of the latest stall.\n"
+        "Usage: `!>stalls`"
+    }
@@ -2,6 +2,9 @@ import os
 #from bot import help_entries  # Changed from help_strings to help_entries
 import cinAPI
 import cinIO
+import cinLogging
+
+logger = cinLogging.getLogger(__name__)
 
 async def send_long_message(channel, content):
     """Helper function to send messages that may exceed Discord's limit"""
@@ -110,7 +113,7 @@ def dump_help_to_md(help_str):
         with open(help_file_path, 'w', encoding='utf-8') as f:
             f.write(help_content.strip())
     except Exception as e:
-        print(f"Failed to create help file: {e}")
+        logger.error("Failed to create help file: %s", e)
         return False
 
     if os.path.exists(readme_path):
@@ -123,7 +126,7 @@ def dump_help_to_md(help_str):
             with open(readme_path, 'w', encoding='utf-8') as f:
                 f.write(new_content)
         else:
-            print("Couldn't find help page marker in README.md")
+            logger.warning("Couldn't find help page marker in README.md")
         return True
     return False
 
@@ -0,0 +1,112 @@
+import re
+import time
+
+import dateparser
+
+import cinAPI
+from cinIO import config
+from cinSearch import searchIndex
+
+max_results = config.get("search", {}).get("maxResults", 10)
+
+channel_mention_regex = re.compile(r"<#(\d+)>")
+user_mention_regex = re.compile(r"<@!?(\d+)>")
+filter_regex = re.compile(r"^(in|from|before|after):(.+)$", re.IGNORECASE)
+
+
+def parse_date(text: str):
+    parsed = dateparser.parse(text)
+    return parsed.timestamp() if parsed else None
+
+
+def parse_search(message: cinAPI.APIMessage):
+    """(terms, filters) from `!>search <terms> [in:#channel] [from:@user] [before:date] [after:date]`"""
+    terms = []
+    filters = {}
+    for word in message.content.split()[1:]:
+        match = filter_regex.match(word)
+        if not match:
+            terms.append(word)
+            continue
+
+        key, value = match.group(1).lower(), match.group(2)
+        if key == "in":
+            mention = channel_mention_regex.fullmatch(value)
+            if value.lower() == "here":
+                filters["channelID"] = message.channel.id
+            elif mention:
+                filters["channelID"] = int(mention.group(1))
+            else:
+                filters["channel"] = value.lstrip("#")
+        elif key == "from":
+            mention = user_mention_regex.fullmatch(value)
+            if mention:
+                filters["authorID"] = int(mention.group(1))
+            else:
+                filters["author"] = value.lstrip("@")
+        else:
+            timestamp = parse_date(value)
+            if timestamp is None:
+                raise ValueError(f"couldn't read `{value}` as a date")
+            filters[key] = timestamp
+    return terms, filters
+
+
+def format_result(result: dict) -> str:
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(result["time"]))
+    content = result["content"].replace("\n", " ")
+    if len(content) > 200:
+        content = content[:197] + "..."
+    return f"`{when}` **{result['author']}** in #{result['channel']}: {content}"
+
+
+async def search_command(message: cinAPI.APIMessage):
+    try:
+        terms, filters = parse_search(message)
+    except ValueError as e:
+        await message.channel.send(str(e))
+        return
+    if not terms:
+        await message.channel.send("usage: `!>search <terms> [in:#channel] [from:@user] [before:date] [after:date]`")
+        return
+
+    # results never leave the server they were said in, and only come from channels the author can read
+    guild = message.guild
+    if guild is None:
+        if "channel" in filters or filters.get("channelID", message.channel.id) != message.channel.id:
+            await message.channel.send("in DMs, search only covers this conversation")
+            return
+        filters["channelID"] = message.channel.id
+        readable = {message.channel.id}
+    else:
+        if "channelID" in filters and filters["channelID"] != message.channel.id:
+            target = await cinAPI.get_client(message.client_name).get_channel_by_id(filters["channelID"])
+            guild = target.guild if target else None
+        readable = guild.readable_channel_ids(message.author.id) if guild else set()
+        if "channelID" in filters and filters["channelID"] not in readable:
+            await message.channel.send("can't search that channel")
+            return
+
+    results = searchIndex.search(terms, guildID=guild.id if guild else None, channelIDs=readable,
+                                 limit=max_results, **filters)
+    if not results:
+        await message.channel.send("no matches")
+        return
+
+    lines = [f"{len(results)} newest matches:"] + [format_result(result) for result in results]
+    await message.channel.send("\n".join(lines)[:2000])
+
+
+def bind_commands():
+    return {
+        "search": search_command
+    }
+
+def bind_help():
+    return {
+        "search": "Searches logged messages in this server's channels you can read, newest first. Usage: \n"
+        "`!>search <terms>` - messages containing every term\n"
+        "`in:#channel` / `in:here` - only in that channel\n"
+        "`from:@user` - only from that user (a display name works too)\n"
+        "`before:<date>` / `after:<date>` - e.g. `after:2024-05-01`, `before:yesterday`\n"
+    }
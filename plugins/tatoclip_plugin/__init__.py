@@ -1,21 +1,24 @@
+import atexit
 import os
+import re
 import difflib
-import time
 import subprocess
-import traceback
 
 #import discord
 import cinAPI
-from pytube import Playlist
 
 import cinIO
-from cinIO import loadCache
-from plugins.tatoclip_plugin.file_operations import save_json_to_filepath, load_clip_file, ensure_clip_file_and_load
+import cinLogging
+from cinIO import loadCache, openStorage
+from plugins.tatoclip_plugin.file_operations import save_json_to_filepath
 from plugins.tatoclip_plugin.metadata_handler import show_metadata, resolve_alias_to_effective_index, get_effective_index, \
-    update_offset, update_alias, get_raw_index
-from plugins.tatoclip_plugin.project_validation import validate_project_file
+    update_offset, update_alias, get_raw_index, get_alias
+from plugins.tatoclip_plugin.playlist_resolver import PlaylistResolver, PytubePlaylistProvider
+from plugins.tatoclip_plugin.project_cache import project_cache, load_project
 from plugins.tatoclip_plugin.time_utils import timestamp_to_sec, format_seconds
 
+logger = cinLogging.getLogger(__name__)
+
 def get_default_cache():
     return {
         "targets.json_path": "",
@@ -29,57 +32,71 @@ def get_default_cache():
 
 lastVideoRawIndex = 1
 
-get_links_memo = {}
-trust_links_memo_timestamp = 0
-
 tatoclip_config = loadCache("tatoclip/tatoclip_config.json", get_default_cache())
 
 targets_json_path = tatoclip_config["targets.json_path"]
 tatoclip_py_path = tatoclip_config["tatoclip.py_path"]
 trust_cache_time_seconds = tatoclip_config["trust_cache_time_seconds"]
 
+playlist_resolver = PlaylistResolver(
+    PytubePlaylistProvider(),
+    openStorage("tatoclip/playlists.json"),
+    ttl_seconds=trust_cache_time_seconds,
+    failure_ttl_seconds=min(300, trust_cache_time_seconds)
+)
+atexit.register(playlist_resolver.close)
+
+# both keyed by str(channel.id), like active_channels
 clipping_mode = {}
 clip_file_names = {}
 
+# channels the "*" phrase handler looks at: clipping mode is on, or a clip file is set. everything else is one lookup
+active_channels = set()
+fuzzy_clip_files = {}  # {(cache_dir, filename): closest existing file name, or None}
+
+# what clip() would act on: a first word containing "clip", or a timestamp-looking first word with something after it
+CLIP_MESSAGE = re.compile(r"\s*(?:\S*clip|[^\s:;]*[:;]\S*\s+\S)", re.IGNORECASE)
+
+
+def update_channel_activation(message: cinAPI.APIMessage):
+    channel_id = str(message.channel.id)
+    if clipping_mode.get(channel_id) or channel_id in clip_file_names:
+        active_channels.add(channel_id)
+    else:
+        active_channels.discard(channel_id)
+
+
+def use_clip_file(message: cinAPI.APIMessage, filepath: str):
+    clip_file_names[str(message.channel.id)] = filepath
+    update_channel_activation(message)
+
+
+def find_close_clip_file(cache_dir: str, filename: str):
+    """closest json file to targets_<filename> in cache_dir. the directory scan and difflib only run once per name"""
+    key = (cache_dir, filename)
+    if key not in fuzzy_clip_files:
+        json_files = [f for f in os.listdir(cache_dir) if f.endswith('.json')]
+        closest_match = difflib.get_close_matches(f"targets_{filename}", json_files, n=1, cutoff=0.90)
+        fuzzy_clip_files[key] = closest_match[0] if closest_match else None
+    return fuzzy_clip_files[key]
+
 async def get_file_path_from_message(message: cinAPI.APIMessage):
     global clip_file_names
-    if message.channel.name not in clip_file_names or not os.path.exists(clip_file_names[message.channel.name]):
+    if str(message.channel.id) not in clip_file_names or not os.path.exists(clip_file_names[str(message.channel.id)]):
         await message.channel.send("No clip configuration found. Use !>setclipfile to initialize.")
         return None
-    return clip_file_names[message.channel.name]
+    return clip_file_names[str(message.channel.id)]
 
 async def check_with_err(condition: bool, warning: str, message: cinAPI.APIMessage = None):
     if condition: return True
     if message:
         await message.channel.send(warning)
     else:
-        print(warning)
+        logger.warning(warning)
     return False
 
-def get_links(url):  # todo: this is already in tatoclip's common.py and has just been accidentally reengineered lmao, use whichever is better for both
-    global get_links_memo
-    global trust_links_memo_timestamp
-    global trust_cache_time_seconds
-
-    # Use memoized result if valid
-    if time.time() < trust_links_memo_timestamp and url in get_links_memo:
-        result = get_links_memo[url]
-        if result: return result
-
-        print(f"Previously failed to get links for playlist {url}, using cached result of False")
-        return False
-
-    try:
-        playlist = Playlist(url)
-        links = list(playlist.video_urls)
-        get_links_memo[url] = links
-        trust_links_memo_timestamp = time.time() + trust_cache_time_seconds
-        return links
-    except Exception as e:
-        print(f"Failed to get links for {url}: {str(e)}")
-        get_links_memo[url] = False
-        traceback.print_exc()
-        return False
+async def get_links(url):  # todo: this is already in tatoclip's common.py and has just been accidentally reengineered lmao, use whichever is better for both
+    return await playlist_resolver.get_links(url)
 
 
 # !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[discord commands]
@@ -89,30 +106,37 @@ async def clip_toggle(message: cinAPI.APIMessage):
 
     channel_id = str(message.channel.id)
     clipping_mode[channel_id] = not clipping_mode.get(channel_id, False)
+    update_channel_activation(message)
     status = "enabled" if clipping_mode[channel_id] else "disabled"
     await message.channel.send(f"Clipping mode {status}.")
 
 
+async def clip_phrase(message: cinAPI.APIMessage):
+    """clip, for every message. inactive channels and messages that can't be clips stop before any parsing"""
+    if str(message.channel.id) not in active_channels or not CLIP_MESSAGE.match(message.content):
+        return
+    await clip(message)
+
+
 async def clip(message: cinAPI.APIMessage):
-    debug_clip_command = True
-    if debug_clip_command: print(f"clip command received while debug_clip_command = True")
+    logger.debug("clip command received in channel %s", message.channel.id)
 
     words = message.content.lower().split()
     global clipping_mode, lastVideoRawIndex, clip_file_names
 
     # Handle clipping mode
-    if len(words) >= 2 and (":" in words[0] or ";" in words[0]) and str(message.channel.id) in clipping_mode:
+    if len(words) >= 2 and (":" in words[0] or ";" in words[0]) and clipping_mode.get(str(message.channel.id)):
         words.insert(0, "clip")
     elif not ("clip" in words[0]):
         return
 
-    if message.channel.name not in clip_file_names and not await set_clip_fileW(message, ["!>setclipfile"]): return
+    if str(message.channel.id) not in clip_file_names and not await set_clip_fileW(message, ["!>setclipfile"]): return
 
     if len(words) > 1 and "toggle" in words[1]:
         await clip_toggle(message)
         return
 
-    data = await ensure_clip_file_and_load(message, await get_file_path_from_message(message))
+    data = await load_project(message, await get_file_path_from_message(message))
     if data is None: return
 
     # Determine raw_index and pairs_start position
@@ -154,16 +178,16 @@ async def clip(message: cinAPI.APIMessage):
 
     # save changes
     if new_data:
-        save_json_to_filepath(new_data, clip_file_names[message.channel.name], False)
+        project_cache.put(clip_file_names[str(message.channel.id)], new_data)
 
     results = f"For index {effective_index} (raw index {raw_index}): \n" + results
 
     if results:
         await message.channel.send(results)
-    if debug_clip_command: print(f"end clip command while debug_clip_command = True")
+    logger.debug("end clip command in channel %s", message.channel.id)
 
 
-def process_single_clip(data: list, raw_index: int, timestamp: str, duration: int) -> tuple:
+async def process_single_clip(data: list, raw_index: int, timestamp: str, duration: int) -> tuple:
     metadata = data[0]
     videos = data[1:]
     timestamp = timestamp.replace(";", ":")
@@ -188,7 +212,7 @@ def process_single_clip(data: list, raw_index: int, timestamp: str, duration: in
 
         # Add link if available
         url = metadata.get("url", "")
-        links = get_links(url)
+        links = await get_links(url)
         if links and raw_index <= len(links):
             link = links[raw_index - 1]
             time_param = f"&t={timestamp_to_sec(timestamp)}"
@@ -206,7 +230,7 @@ async def handle_single_clip(message, data, raw_index, pairs_start) -> (list, st
     except (ValueError, IndexError):
         return None, "Duration must be an integer."
 
-    new_data, result_msg = process_single_clip(data, raw_index, timestamp, duration)
+    new_data, result_msg = await process_single_clip(data, raw_index, timestamp, duration)
     result_msg = result_msg.replace("`", "")
 
     return new_data, result_msg
@@ -228,7 +252,7 @@ async def handle_batch_clips(message, data, raw_index, pairs_start) -> (list, st
             results.append(f"Invalid duration: {pairs[i + 1]}")
             continue
 
-        updated_data, result_msg = process_single_clip(current_data, raw_index, timestamp, duration)
+        updated_data, result_msg = await process_single_clip(current_data, raw_index, timestamp, duration)
         if updated_data is None:
             results.append(result_msg)
         else:
@@ -237,7 +261,7 @@ async def handle_batch_clips(message, data, raw_index, pairs_start) -> (list, st
 
     # Add video reference if available
     url = current_data[0].get("url")
-    links = get_links(url)
+    links = await get_links(url)
     if links and raw_index <= len(links):
         video_id = links[raw_index - 1].split('v=')[1].split('&')[0]
         thumbnail_url = f"[.](https://img.youtube.com/vi/{video_id}/default.jpg)"
@@ -251,9 +275,6 @@ def format_part_info(data, raw_index):
     if len(data) <= 1:  # No videos in data
         return f"Part {raw_index}"
 
-    metadata = data[0]
-    aliases = metadata.get("aliases", {})
-
     # Calculate effective index
     effective_index = get_effective_index(data, raw_index)
 
@@ -263,7 +284,7 @@ def format_part_info(data, raw_index):
     ]
 
     # Add alias if exists
-    alias = aliases.get(str(raw_index))
+    alias = get_alias(data, raw_index)
     if alias:
         info_parts.append(f"Alias: {alias}")
 
@@ -280,7 +301,7 @@ async def format_clips_for_video(data: list, raw_index: int) -> str:
 
     part_info = format_part_info(data, raw_index)
     url = data[0].get("url")
-    links = get_links(url)
+    links = await get_links(url)
 
     lines = [part_info]
     if links and raw_index <= len(links):
@@ -294,7 +315,7 @@ async def get_clips(message: cinAPI.APIMessage):
     global clip_file_names
     if not await check_with_err(len(words) >= 2, "Usage: !>getclips <index or alias>", message): return
 
-    data = await ensure_clip_file_and_load(message, await get_file_path_from_message(message))
+    data = await load_project(message, await get_file_path_from_message(message))
     if data is None: return
 
     # Try to parse as alias first
@@ -305,8 +326,6 @@ async def get_clips(message: cinAPI.APIMessage):
         await message.channel.send(f"Invalid index or alias: {alias_or_index}")
         return
 
-    print("\n\n\n\n\n\njjjjjj\n\n\n\n\n\n")
-
     # If not an alias, parse as effective index
     raw_index = effective_index if is_alias else get_raw_index(data, effective_index)
 
@@ -325,7 +344,7 @@ async def get_clips(message: cinAPI.APIMessage):
     if not await check_with_err(isinstance(clips, dict), f"Unexpected format in the clip file at index {raw_index}.", message): return
 
     video_url = data[0].get("url")
-    links = get_links(video_url)
+    links = await get_links(video_url)
     if links and raw_index <= len(links):
         # await message.channel.send(f"```{formatted}```" + f" \n{links[raw_index-1]}?app=desktop")
         video_id = links[raw_index - 1].split('v=')[1].split('&')[0]
@@ -341,56 +360,48 @@ async def get_clips(message: cinAPI.APIMessage):
 
 
 async def get_all_clips(message: cinAPI.APIMessage):
-    data = await ensure_clip_file_and_load(message, await get_file_path_from_message(message))
+    data = await load_project(message, await get_file_path_from_message(message))
     if data is None:
         return
 
     metadata = data[0]
     videos = data[1:]
     url = metadata.get("url")
-    links = get_links(url)
+    links = await get_links(url)
 
     if not await check_with_err(True and videos, "No clips found.", message): return
 
-    blocks = []
     total_runtime = 0
 
-    for raw_index, clips in enumerate(videos, start=1):
-        if not isinstance(clips, dict): continue
+    def clip_blocks():  # one per video, built as the paginator asks for them
+        nonlocal total_runtime
+        for raw_index, clips in enumerate(videos, start=1):
+            if not isinstance(clips, dict): continue
 
-        runtime = 0
-        clip_lines = []
+            runtime = 0
+            clip_lines = []
 
-        # Add part info header
-        part_info = format_part_info(data, raw_index)
-        clip_lines.append(part_info)
+            # Add part info header
+            part_info = format_part_info(data, raw_index)
+            clip_lines.append(part_info)
 
-        # Add link if available
-        link_text = links[raw_index-1] if raw_index <= len(links) else "unavailable"
-        clip_lines.append(f"Video URL: {link_text}")
-
-        # Process clips
-        for timestamp, duration in clips.items():
-            clip_lines.append(f"    {timestamp}: {duration}s")
-            runtime += duration
-
-        total_runtime += runtime
-        clip_block = f"Runtime: {format_seconds(runtime)}:\n" + "\n".join(clip_lines)
-        blocks.append(f"```{clip_block}```")
-
-    # Send in chunks
-    max_length = 1900
-    current_block = ""
-    for block in blocks:
-        if len(current_block) + len(block) > max_length:
-            await message.channel.send(current_block)
-            current_block = ""
-            time.sleep(1)
-        current_block += block + "\n"
-
-    if current_block:
-        await message.channel.send(current_block)
+            # Add link if available
+            link_text = links[raw_index-1] if links and raw_index <= len(links) else "unavailable"
+            clip_lines.append(f"Video URL: {link_text}")
+
+            # Process clips
+            for timestamp, duration in clips.items():
+                clip_lines.append(f"    {timestamp}: {duration}s")
+                runtime += duration
+
+            total_runtime += runtime
+            yield f"Runtime: {format_seconds(runtime)}:\n" + "\n".join(clip_lines)
 
+    filename = os.path.basename(clip_file_names[str(message.channel.id)]).replace(".json", "_clips.txt")
+    await cinAPI.send_paginated(message.channel, clip_blocks(), limit=1900, fence="```",
+                                attach_over_pages=tatoclip_config.get("attach_over_pages", 5), filename=filename)
+
+    await cinAPI.send_rate_limiter.wait(message.channel)
     await message.channel.send(f"Total runtime: {format_seconds(total_runtime)}")
 
 async def set_clip_file(message: cinAPI.APIMessage):
@@ -412,31 +423,24 @@ async def set_clip_fileW(message: cinAPI.APIMessage, words = None):
     filepath = os.path.join(cache_dir, filename)
 
     if os.path.exists(filepath):  # ---------------------------------------------------------------------------------------------- case file exists, use it --- #
-        clip_file_names[message.channel.name] = filepath
-
-        data = load_clip_file(filepath)
-        if data is None: return False
+        use_clip_file(message, filepath)
 
-        valid, msg = validate_project_file(data)
-        if not await check_with_err(valid, f"Warning: Invalid project file structure: {msg}", message): return False
+        data = project_cache.get(filepath)  # validates on load
+        if not await check_with_err(data is not None, "Warning: Invalid project file structure", message): return False
 
         await message.channel.send(f"Loading clip configuration from {filepath}.")
         return True
 
     # Search for a close match within the cache directory
-    json_files = [f for f in os.listdir(cache_dir) if f.endswith('.json')]
-    closest_match = difflib.get_close_matches(f"targets_{filename}", json_files, n=1, cutoff=0.90)
+    closest_match = find_close_clip_file(cache_dir, filename)
 
     if closest_match:  # ------------------------------------------------------------------------------------------- case fuzzy match for file exists, use it --- #
-        filename = closest_match[0]
+        filename = closest_match
         filepath = os.path.join(cache_dir, filename)
 
-        clip_file_names[message.channel.name] = filepath
-        data = load_clip_file(filepath)
-        if data is None: return False
-
-        valid, msg = validate_project_file(data)
-        await check_with_err(valid, f"Warning: Invalid project file structure in matched file (might just be missing url): {msg}")
+        use_clip_file(message, filepath)
+        data = project_cache.get(filepath)
+        if not await check_with_err(data is not None, "Warning: Invalid project file structure in matched file", message): return False
 
         await message.channel.send(f"Found a close match for the alias: {filename}")
         lastVideoRawIndex = len(data)
@@ -456,7 +460,7 @@ async def set_clip_fileW(message: cinAPI.APIMessage, words = None):
     ]
 
     if url:
-        links = get_links(url)
+        links = await get_links(url)
         if not await check_with_err(True and links, f"Failed to fetch playlist for {url}", message): return False
 
         data[0]["url"] = url
@@ -468,10 +472,13 @@ async def set_clip_fileW(message: cinAPI.APIMessage, words = None):
     else:
         await message.channel.send(f"New empty clip configuration created. Add a URL later with !>seturl.")
 
-    # Save the new project file in the cache directory
-    save_json_to_filepath(data, filepath)
+    # Save the new project file in the cache directory. written right away, so the file exists for the next command
+    project_cache.put(filepath, data)
+    project_cache.flush(filepath)
+    for key in [key for key in fuzzy_clip_files if key[0] == cache_dir]:
+        fuzzy_clip_files.pop(key)  # the new file might be a closer match now
 
-    clip_file_names[message.channel.name] = filepath
+    use_clip_file(message, filepath)
     await message.channel.send(f"Clip configuration saved to {filepath}.")
     return True
 
@@ -479,7 +486,7 @@ async def set_clip_fileW(message: cinAPI.APIMessage, words = None):
 async def set_url(message: cinAPI.APIMessage):
     global clip_file_names
 
-    if not await check_with_err(message.channel.name in clip_file_names,"No clip file configured. Use !>setclipfile first.", message):
+    if not await check_with_err(str(message.channel.id) in clip_file_names,"No clip file configured. Use !>setclipfile first.", message):
         return False
 
     words = message.content.split()
@@ -487,21 +494,23 @@ async def set_url(message: cinAPI.APIMessage):
         return False
 
     url = words[1]
-    filepath = clip_file_names[message.channel.name]
+    filepath = clip_file_names[str(message.channel.id)]
 
     try:
-        links = get_links(url)
+        links = await get_links(url)
         if not await check_with_err(links,f"Failed to fetch playlist for {url}. Please check the URL and try again.", message):
             return False
 
-        data = load_clip_file(filepath)
+        data = project_cache.get(filepath)
+        if not await check_with_err(data is not None, "Failed to load clip file.", message):
+            return False
         data[0]["url"] = url
 
         # Add empty clip entries
         while len(data) < len(links) + 1:
             data.append({})
 
-        save_json_to_filepath(data, filepath)
+        project_cache.put(filepath, data)
 
         await message.channel.send(f"Playlist URL updated to {url}")
         return True
@@ -513,17 +522,17 @@ async def set_url(message: cinAPI.APIMessage):
 
 async def render_clips(message: cinAPI.APIMessage):
     words = message.content.split()
-    if message.channel.name not in clip_file_names and not await set_clip_fileW(message, ["!>setclipfile"]):
+    if str(message.channel.id) not in clip_file_names and not await set_clip_fileW(message, ["!>setclipfile"]):
         return
 
     # Ensure valid clip configuration
-    data = await ensure_clip_file_and_load(message, await get_file_path_from_message(message))
+    data = await load_project(message, await get_file_path_from_message(message))
     if data is None: 
         return
 
     # Write data to targets JSON
     try:
-        origin = os.path.basename(clip_file_names[message.channel.name])
+        origin = os.path.basename(clip_file_names[str(message.channel.id)])
         backup_path = os.path.join(os.path.dirname(targets_json_path), origin)
         save_json_to_filepath(data, backup_path, True)
     except Exception as e:
@@ -559,11 +568,11 @@ async def set_offset(message: cinAPI.APIMessage):
         await message.channel.send("Both part_number and offset_value must be integers")
         return
 
-    data = await ensure_clip_file_and_load(message, await get_file_path_from_message(message))
+    data = await load_project(message, await get_file_path_from_message(message))
     if data is None: return
 
     data = update_offset(data, part_number, offset_value)
-    save_json_to_filepath(data, clip_file_names[message.channel.name], False)
+    project_cache.put(clip_file_names[str(message.channel.id)], data)
     await message.channel.send(f"Offset for part {part_number} set to {offset_value}")
 
 
@@ -579,12 +588,12 @@ async def set_alias(message: cinAPI.APIMessage):
         await message.channel.send("Index must be an integer")
         return
 
-    data = await ensure_clip_file_and_load(message, await get_file_path_from_message(message))
+    data = await load_project(message, await get_file_path_from_message(message))
     if data is None: return
 
     #raw_index = get_raw_index(data, effective_index)
     data = update_alias(data, raw_index, alias)
-    save_json_to_filepath(data, clip_file_names[message.channel.name], False)
+    project_cache.put(clip_file_names[str(message.channel.id)], data)
 
     if alias:
         await message.channel.send(f"Alias for index {raw_index} set to '{alias}'")
@@ -601,7 +610,7 @@ async def set_metadata(message: cinAPI.APIMessage):
                                    "Available keys: name, prefix, url, version")
         return
 
-    data = await ensure_clip_file_and_load(message, await get_file_path_from_message(message))
+    data = await load_project(message, await get_file_path_from_message(message))
     if data is None:
         return
 
@@ -628,7 +637,7 @@ async def set_metadata(message: cinAPI.APIMessage):
     original_case_key = next((k for k in metadata.keys() if k.lower() == key), key)
     metadata[original_case_key] = value
 
-    save_json_to_filepath(data, clip_file_names[message.channel.name], False)
+    project_cache.put(clip_file_names[str(message.channel.id)], data)
     await message.channel.send(f"Metadata updated: {original_case_key} = {value}")
 
 async def show_metadata_command(message: cinAPI.APIMessage):
@@ -640,7 +649,7 @@ async def show_metadata_command(message: cinAPI.APIMessage):
 # Binding functions
 def bind_phrases():
     return {
-        "*": clip
+        "*": clip_phrase
     }
 
 
@@ -671,8 +680,8 @@ def bind_help():
         "clip": "Add/edit clips. Usage:\n"
                 "`[clip] <index> <timestamp> <duration>`\n"
                 "`[clip] <timestamp> <duration>` (uses last index)\n"
-                "`clip toggle` - Toggle clipping mode\n"
-                "Set duration=0 to delete clip",
+                "`!>clip toggle` - Toggle clipping mode\n"
+                "Set duration=0 to delete clip. Without `!>`, only works in channels with a clip file or clipping mode on",
         "getclips": "View clips for video. Usage: `!>getclips <index>`",
         "getallclips": "View all clips. Usage: `!>getallclips`",
         "renderclips": "Start rendering. Usage: `!>renderclips [start] [end]`",
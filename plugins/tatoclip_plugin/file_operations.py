@@ -1,10 +1,11 @@
 import json
 import os
-import traceback
 
-from cinLogging import printLabelWithInfo
+from cinLogging import getLogger
 from plugins.tatoclip_plugin.project_validation import validate_project_file, convert_v0_to_v1
 
+logger = getLogger(__name__)
+
 
 # !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[file loading]
 
@@ -42,7 +43,7 @@ def load_clip_file(filepath):
 
         # Convert v0 to v1 if needed
         if isinstance(data, dict):
-            printLabelWithInfo("Converting v0 to v1", filepath)
+            logger.info("Converting %s from v0 to v1", filepath)
             data = convert_v0_to_v1(data)
             # Save converted version
             save_json_to_filepath(data, filepath, True)
@@ -50,31 +51,16 @@ def load_clip_file(filepath):
         # Validate after conversion
         valid, msg = validate_project_file(data)
         if not valid:
-            print(f"Invalid project file: {msg}")
+            logger.error("Invalid project file: %s", msg)
             return None
 
         return data
     except FileNotFoundError:
-        print(f"Error: File '{filepath}' not found.")
+        logger.error("File '%s' not found.", filepath)
         return None
     except json.JSONDecodeError:
-        print(f"Error: Failed to parse JSON from '{filepath}'")
+        logger.error("Failed to parse JSON from '%s'", filepath)
         return None
     except Exception as e:
-        print(f"Unexpected error loading clip file: {str(e)}")
-        traceback.print_exc()
-        return None
-
-
-async def ensure_clip_file_and_load(message, filepath): # wrapper for load_clip_file
-    data = load_clip_file(filepath)
-    if data is None:
-        await message.channel.send("Failed to load clip file.")
+        logger.exception("Unexpected error loading clip file: %s", e)
         return None
-
-    valid, msg = validate_project_file(data)
-    if not valid:
-        await message.channel.send(f"Invalid file structure: {msg}")
-        return None
-
-    return data
\ No newline at end of file
@@ -1,113 +1,117 @@
-from plugins.tatoclip_plugin import ensure_clip_file_and_load
+import bisect
+from typing import Dict, Optional, Tuple
 
+from plugins.tatoclip_plugin.project_cache import load_project
 
-def get_effective_index(data, raw_index):
-    """Convert raw index to effective index considering offsets"""
-    if not data or not isinstance(data, list) or len(data) == 0:
-        return raw_index
-
-    metadata = data[0]
-    offsets = metadata.get("offsets", {})
-
-    # Convert offsets to sorted list of (effective_threshold, shift)
-    offset_points = []
-    for k, v in offsets.items():
-        try:
-            offset_points.append((int(k), int(v)))
-        except (ValueError, TypeError):
-            continue
 
-    # Sort by effective threshold
-    offset_points.sort(key=lambda x: x[0])
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[index]
 
-    # Calculate how many videos are skipped before this raw index
-    total_skipped = 0
-    for effective_threshold, shift in offset_points:
-        # The raw index where this offset starts applying
-        raw_threshold = effective_threshold + total_skipped
-        if raw_index >= raw_threshold:
-            total_skipped += shift
-        else:
-            break
-
-    return raw_index - total_skipped
+class ProjectIndex:
+    """
+    A project's offsets and aliases, compiled once: raw <-> effective index mapping is a bisect over the
+    sorted offset points, alias lookup is a dict hit, and the raw indices skipped over by offsets (what
+    negative effective indices point at) are listed up front.
+    """
 
+    def __init__(self, metadata: dict):
+        offset_points = []
+        for k, v in metadata.get("offsets", {}).items():
+            try:
+                offset_points.append((int(k), int(v)))
+            except (ValueError, TypeError):
+                continue
+        offset_points.sort(key=lambda x: x[0])
 
-def get_raw_index(data, effective_index):
-    """Convert effective index to raw index considering offsets"""
-    if not data or not isinstance(data, list) or len(data) == 0:
-        return effective_index
+        # effective -> raw: every offset at or below the effective index applies
+        self.effective_thresholds = [threshold for threshold, _ in offset_points]
+        self.shift_totals = [0]  # shift_totals[k] = sum of the first k shifts
+        for _, shift in offset_points:
+            self.shift_totals.append(self.shift_totals[-1] + shift)
 
-    metadata = data[0]
-    offsets = metadata.get("offsets", {})
+        # raw -> effective: an offset's raw threshold is its effective threshold plus everything skipped before
+        # it, and offsets apply up to the first threshold past the raw index. running max keeps that bisectable
+        self.raw_thresholds = []
+        for i, (threshold, _) in enumerate(offset_points):
+            raw_threshold = threshold + self.shift_totals[i]
+            self.raw_thresholds.append(max(raw_threshold, self.raw_thresholds[-1]) if self.raw_thresholds else raw_threshold)
 
-    # Handle negative effective indices (skipped videos)
-    if effective_index < 0:
-        # Build list of all skipped raw indices
-        skipped_indices = []
+        self.skipped = []
         current_raw = 1
         current_effective = 1
+        for threshold, shift in offset_points:
+            if current_effective < threshold:
+                current_raw += threshold - current_effective
+                current_effective = threshold
+            self.skipped.extend(range(current_raw, current_raw + shift))
+            current_raw += shift
 
-        # Convert offsets to sorted list and process
-        offset_points = []
-        for k, v in offsets.items():
+        self.aliases = {}  # {raw index: alias}
+        self.alias_indices = {}  # {alias: raw index}, first one set wins
+        for index, alias in metadata.get("aliases", {}).items():
             try:
-                offset_points.append((int(k), int(v)))
+                index = int(index)
             except (ValueError, TypeError):
                 continue
-        offset_points.sort(key=lambda x: x[0])
+            self.aliases.setdefault(index, alias)
+            self.alias_indices.setdefault(alias, index)
 
-        for effective_threshold, shift in offset_points:
-            # Add all videos up to this threshold
-            while current_effective < effective_threshold:
-                current_raw += 1
-                current_effective += 1
+    def effective_index(self, raw_index: int) -> int:
+        return raw_index - self.shift_totals[bisect.bisect_right(self.raw_thresholds, raw_index)]
 
-            # Skip the specified number of videos
-            for i in range(shift):
-                skipped_indices.append(current_raw + i)
+    def raw_index(self, effective_index: int) -> Optional[int]:
+        if effective_index < 0:
+            idx = -effective_index - 1
+            return self.skipped[idx] if idx < len(self.skipped) else None
+        return effective_index + self.shift_totals[bisect.bisect_right(self.effective_thresholds, effective_index)]
 
-            current_raw += shift
 
-        # Return the corresponding skipped index for negative effective
-        idx = -effective_index - 1
-        return skipped_indices[idx] if idx < len(skipped_indices) else None
+_indexes: Dict[int, Tuple[dict, ProjectIndex]] = {}  # {id(metadata): (metadata, index)}. holding metadata keeps its id ours
+MAX_INDEXES = 32
 
-    # For positive effective indices, calculate the corresponding raw index
-    offset_points = []
-    for k, v in offsets.items():
-        try:
-            offset_points.append((int(k), int(v)))
-        except (ValueError, TypeError):
-            continue
-    offset_points.sort(key=lambda x: x[0])
 
-    raw_index = effective_index
-    total_shift = 0
+def get_index(data) -> Optional[ProjectIndex]:
+    """the compiled index for data's metadata, built on first use. None if data has no metadata"""
+    if not data or not isinstance(data, list) or not isinstance(data[0], dict):
+        return None
 
-    for effective_threshold, shift in offset_points:
-        if effective_index >= effective_threshold:
-            total_shift += shift
-        else:
-            break
+    metadata = data[0]
+    cached = _indexes.get(id(metadata))
+    if cached is not None and cached[0] is metadata:
+        return cached[1]
 
-    return effective_index + total_shift
+    index = ProjectIndex(metadata)
+    if len(_indexes) >= MAX_INDEXES:
+        _indexes.pop(next(iter(_indexes)))
+    _indexes[id(metadata)] = (metadata, index)
+    return index
 
 
-def resolve_alias_to_effective_index(data, alias) -> (int, bool):
-    if not data or len(data) < 1:
-        try:
-            return int(alias), False  # Fallback to direct index if no metadata
-        except ValueError:
-            return None, False
+def invalidate_index(metadata: dict):
+    _indexes.pop(id(metadata), None)
 
-    metadata = data[0]
-    aliases = metadata.get("aliases", {})
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[lookups]
+
+def get_effective_index(data, raw_index):
+    """Convert raw index to effective index considering offsets"""
+    index = get_index(data)
+    return index.effective_index(raw_index) if index else raw_index
 
-    # Find index by alias
-    for index, al in aliases.items():
-        if al == alias:
-            return int(index), True
+
+def get_raw_index(data, effective_index):
+    """Convert effective index to raw index considering offsets. Negative effective indices are skipped videos"""
+    index = get_index(data)
+    return index.raw_index(effective_index) if index else effective_index
+
+
+def get_alias(data, raw_index) -> Optional[str]:
+    index = get_index(data)
+    return index.aliases.get(int(raw_index)) if index else None
+
+
+def resolve_alias_to_effective_index(data, alias) -> (int, bool):
+    index = get_index(data)
+    if index is not None and alias in index.alias_indices:
+        return index.alias_indices[alias], True
 
     # Try to parse as direct index
     try:
@@ -115,6 +119,10 @@ def resolve_alias_to_effective_index(data, alias) -> (int, bool):
     except ValueError:
         return None, False
 
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[updates]
+
+# offsets and aliases are keyed by strings, same as they come back from json, so cached and reloaded projects match.
+# anything changing them has to go through these, so the compiled index gets rebuilt
 
 def update_offset(data, part_number, offset_value):
     if not data or len(data) < 1:
@@ -125,10 +133,11 @@ def update_offset(data, part_number, offset_value):
         metadata["offsets"] = {}
 
     if offset_value is None:
-        metadata["offsets"].pop(part_number, None)
+        metadata["offsets"].pop(str(part_number), None)
     else:
-        metadata["offsets"][part_number] = offset_value
+        metadata["offsets"][str(part_number)] = offset_value
 
+    invalidate_index(metadata)
     return data
 
 
@@ -141,15 +150,16 @@ def update_alias(data, index, alias):
         metadata["aliases"] = {}
 
     if alias is None:
-        metadata["aliases"].pop(index, None)
+        metadata["aliases"].pop(str(index), None)
     else:
-        metadata["aliases"][index] = alias
+        metadata["aliases"][str(index)] = alias
 
+    invalidate_index(metadata)
     return data
 
 
 async def show_metadata(message, filepath):
-    data = await ensure_clip_file_and_load(message, filepath)
+    data = await load_project(message, filepath)
     if data is None:
         return
 
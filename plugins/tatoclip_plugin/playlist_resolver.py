@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Protocol, Union
+
+import cinLogging
+from cinIO import CacheStorage
+
+logger = cinLogging.getLogger(__name__)
+
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[providers]
+
+class PlaylistProvider(Protocol):
+    def video_urls(self, url: str) -> List[str]:
+        """blocking fetch of every video url in a playlist. raises if it can't"""
+        ...
+
+
+class PytubePlaylistProvider:
+    def video_urls(self, url: str) -> List[str]:
+        from pytube import Playlist  # only needed once something's actually fetched
+        return list(Playlist(url).video_urls)
+
+
+class FakePlaylistProvider:
+    """in-memory playlists, for tests. unknown urls fail like a bad fetch would. calls counts fetches per url"""
+
+    def __init__(self, playlists: Optional[Dict[str, List[str]]] = None, delay: float = 0.0):
+        self.playlists = dict(playlists or {})
+        self.delay = delay
+        self.calls = Counter()
+
+    def video_urls(self, url: str) -> List[str]:
+        self.calls[url] += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if url not in self.playlists:
+            raise ValueError(f"no such playlist: {url}")
+        return list(self.playlists[url])
+
+
+# !!!~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~[resolver]
+
+class PlaylistResolver:
+    """
+    Playlist url -> video links, without ever fetching on the event loop.
+
+    Fetches run on at most max_workers daemon threads (a hung fetch can't hold up exiting), and concurrent
+    lookups of one url share a single fetch. Every url has its own expiry: within ttl_seconds the cached links
+    are returned as-is, after that they're still returned right away while a refresh runs in the background
+    (stale-while-revalidate). Failed fetches are remembered for failure_ttl_seconds. Results are written to
+    storage on a writer thread, so a restart doesn't refetch anything still fresh.
+    """
+
+    def __init__(self, provider: PlaylistProvider, storage: Optional[CacheStorage] = None,
+                 ttl_seconds: float = 3600, failure_ttl_seconds: float = 300, max_workers: int = 2):
+        self.provider = provider
+        self.storage = storage
+        self.ttl_seconds = ttl_seconds
+        self.failure_ttl_seconds = failure_ttl_seconds
+        self._fetch_slots = asyncio.Semaphore(max_workers)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tatoclip_playlists_writer")
+        self._closed = False
+        self._entries: Dict[str, dict] = storage.load() if storage else {}  # {url: {"links": [...] | None, "fetched_at": t}}
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def _is_fresh(self, entry: dict) -> bool:
+        ttl = self.ttl_seconds if entry["links"] is not None else self.failure_ttl_seconds
+        return time.time() - entry["fetched_at"] < ttl
+
+    async def get_links(self, url: str) -> Union[List[str], bool]:
+        """the playlist's links, or False if it can't be fetched"""
+        if not url:
+            return False
+
+        entry = self._entries.get(url)
+        if entry is None:
+            entry = await self._fetch(url)
+        elif not self._is_fresh(entry) and url not in self._in_flight:
+            self._fetch(url)  # revalidate in the background, answer with what we have
+        return entry["links"] or False
+
+    def peek(self, url: str) -> Union[List[str], bool]:
+        """cached links only, never fetches"""
+        entry = self._entries.get(url)
+        return (entry["links"] or False) if entry else False
+
+    def _fetch(self, url: str) -> asyncio.Future:
+        if self._closed:
+            raise RuntimeError("playlist resolver is closed")
+        future = self._in_flight.get(url)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch_once(url))
+            self._in_flight[url] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(url, None))
+        return future
+
+    async def _run_in_daemon_thread(self, func, *args):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def settle(result, error):
+            self._fetch_slots.release()
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        def run():
+            result, error = None, None
+            try:
+                result = func(*args)
+            except Exception as e:
+                error = e
+            try:
+                loop.call_soon_threadsafe(settle, result, error)
+            except RuntimeError:
+                pass  # the loop's gone, nobody's waiting anymore
+
+        # the slot is held until the thread finishes, even if whoever was waiting gave up
+        await self._fetch_slots.acquire()
+        threading.Thread(target=run, name="tatoclip_playlist_fetch", daemon=True).start()
+        return await future
+
+    async def _fetch_once(self, url: str) -> dict:
+        try:
+            links = await self._run_in_daemon_thread(self.provider.video_urls, url)
+        except Exception as e:
+            logger.warning("Failed to get links for %s: %s", url, e)
+            links = None
+
+        entry = {"links": links, "fetched_at": time.time()}
+        previous = self._entries.get(url)
+        if links is None and previous and previous["links"] is not None:
+            # a failed refresh keeps serving the last good links, and tries again once a failure would expire
+            entry = {"links": previous["links"], "fetched_at": time.time() - self.ttl_seconds + self.failure_ttl_seconds}
+        self._entries[url] = entry
+        if self.storage is not None:
+            self._write(self.storage.set, url, entry)
+        return entry
+
+    def _write(self, operation, *args):
+        # storage writes are ordered, and never on the event loop
+        if not self._closed:
+            self._writer.submit(operation, *args).add_done_callback(self._log_write_error)
+
+    @staticmethod
+    def _log_write_error(future):
+        if future.exception() is not None:
+            logger.error("Failed to store playlist links: %s", future.exception())
+
+    def invalidate(self, url: str):
+        self._entries.pop(url, None)
+        if self.storage is not None:
+            self._write(self.storage.delete, url)
+
+    def close(self):
+        """cancel fetches still in progress or waiting for a thread, and finish the pending storage writes"""
+        self._closed = True
+        for future in list(self._in_flight.values()):
+            future.cancel()
+        self._writer.shutdown(wait=True, cancel_futures=False)
@@ -0,0 +1,147 @@
+import asyncio
+import atexit
+import copy
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import cinLogging
+from cinIO import atomicWriteJson
+from plugins.tatoclip_plugin.file_operations import load_clip_file
+
+logger = cinLogging.getLogger(__name__)
+
+
+@dataclass
+class ProjectEntry:
+    data: list
+    mtime_ns: int  # of the file as we last read or wrote it
+    size: int
+    version: int = 0  # bumped by every put()
+    written: int = 0  # the version that's on disk
+
+
+class ProjectCache:
+    """
+    Project files, loaded and validated once and then kept in memory, keyed by path.
+
+    Commands mutate the cached list and call put(); the file is rewritten (atomically, on a worker thread) once
+    the flush window passes, so a burst of clips is a single write. If the file changes on disk behind our back (mtime or size
+    differ from what we last saw), the next get() reloads it.
+    """
+
+    def __init__(self, flush_seconds: float = 2.0):
+        self.flush_seconds = flush_seconds
+        self._entries: Dict[str, ProjectEntry] = {}
+        self._dirty = set()
+        self._flush_handle = None
+        self._write_lock = threading.Lock()
+
+        # counters, to check how much disk io this is actually saving
+        self.loads = 0
+        self.hits = 0
+        self.writes = 0
+
+    def get(self, filepath: str) -> Optional[list]:
+        """the project at filepath, or None if it can't be loaded or isn't valid"""
+        if not filepath:
+            return None
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            stat = None
+
+        entry = self._entries.get(filepath)
+        if entry is not None:
+            unwritten = entry.version > entry.written  # pending, or still being written
+            if unwritten or (stat and (stat.st_mtime_ns, stat.st_size) == (entry.mtime_ns, entry.size)):
+                self.hits += 1
+                return entry.data
+            logger.info("%s changed on disk, reloading", filepath)
+            self._entries.pop(filepath, None)
+
+        data = load_clip_file(filepath)  # converts v0 files and validates
+        if data is None:
+            return None
+        self.loads += 1
+        stat = os.stat(filepath)
+        self._entries[filepath] = ProjectEntry(data, stat.st_mtime_ns, stat.st_size)
+        return data
+
+    def put(self, filepath: str, data: list):
+        """replace (or create) the project at filepath in memory and schedule the write"""
+        entry = self._entries.get(filepath)
+        if entry is None:
+            self._entries[filepath] = ProjectEntry(data, 0, 0)
+        else:
+            entry.data = data
+        self._entries[filepath].version += 1
+        self._dirty.add(filepath)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop is None or self.flush_seconds <= 0:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.flush_seconds, self._flush_in_background)
+
+    def _flush_in_background(self):
+        self._flush_handle = None
+        pending = self._take_pending(list(self._dirty))
+        if pending:
+            asyncio.ensure_future(asyncio.to_thread(self._write_all, pending))
+
+    def flush(self, filepath: Optional[str] = None):
+        """write pending projects now. just the one at filepath, if given"""
+        if filepath is None and self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._write_all(self._take_pending([filepath] if filepath is not None else list(self._dirty)))
+
+    def _take_pending(self, paths) -> list:
+        """(path, entry, version, a copy of the data) for each dirty path, which stops being dirty"""
+        pending = []
+        for path in paths:
+            if path not in self._dirty:
+                continue
+            self._dirty.discard(path)
+            entry = self._entries[path]
+            pending.append((path, entry, entry.version, copy.deepcopy(entry.data)))
+        return pending
+
+    def _write_all(self, pending: list):
+        with self._write_lock:
+            for path, entry, version, data in pending:
+                if version <= entry.written:
+                    continue  # a newer version already went out
+                try:
+                    atomicWriteJson(path, data, compact=False)  # these get read and edited by hand
+                    stat = os.stat(path)
+                except Exception as e:
+                    logger.error("Failed to write project %s: %s", path, e)
+                    continue
+                entry.mtime_ns, entry.size, entry.written = stat.st_mtime_ns, stat.st_size, version
+                self.writes += 1
+
+    def invalidate(self, filepath: str):
+        """forget filepath, writing it first if it has pending changes"""
+        self.flush(filepath)
+        self._entries.pop(filepath, None)
+
+
+project_cache = ProjectCache()
+atexit.register(project_cache.flush)
+
+
+async def load_project(message, filepath) -> Optional[list]:
+    """project_cache.get, telling the channel if it fails"""
+    data = project_cache.get(filepath)
+    if data is None:
+        await message.channel.send("Failed to load clip file.")
+    return data
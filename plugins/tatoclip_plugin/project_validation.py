@@ -1,3 +1,7 @@
+from cinLogging import getLogger
+
+logger = getLogger(__name__)
+
 
 def convert_v0_to_v1(data: dict) -> list:
     """Convert version 0 project format to version 1"""
@@ -6,7 +10,7 @@ def convert_v0_to_v1(data: dict) -> list:
 
     is_v0, msg = validate_project_file_v0(data)
     if not is_v0:
-        print(msg)
+        logger.debug("not a v0 project: %s", msg)
         return data # invalid v0 format?
 
     new_data = []
@@ -0,0 +1,24 @@
+# tests/test_console_stream.py
+# run from the repo root: python -m pytest tests
+import sys
+
+from cinLogging import ConsoleSink, _ConsoleStream
+
+
+def test_stdout_attributes_reach_the_real_stream(tmp_path, monkeypatch):
+    with open(tmp_path / "stdout.txt", "w+", encoding="utf-8") as real:
+        monkeypatch.setattr(sys, "stdout", real)
+        sink = ConsoleSink()
+        sink.start()
+        assert isinstance(sys.stdout, _ConsoleStream)
+
+        assert sys.stdout.encoding == real.encoding
+        assert sys.stdout.fileno() == real.fileno()
+        assert sys.stdout.errors == real.errors
+        assert sys.stdout.buffer is real.buffer
+
+        print("through the sink")
+        sys.stdout.writelines(["a\n", "b\n"])
+        sink.flush()
+        real.seek(0)
+        assert real.read() == "through the sink\na\nb\n"
@@ -0,0 +1,62 @@
+# tests/test_event_queue.py
+# run from the repo root: python -m pytest tests
+import asyncio
+import time
+
+import cinAPI
+
+
+class _Channel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+
+
+class _Message:
+    def __init__(self, channel_id: int, content: str):
+        self.channel = _Channel(channel_id)
+        self.content = content
+
+
+class _QueuedClient(cinAPI.InternalEventDispatchMixin):
+    pass
+
+
+def _run_with_handler(handler, messages, workers: int = 1):
+    """queue messages through a fresh client with one worker (so every channel shares a shard)"""
+    client_name = f"test_event_queue_{id(handler)}"
+    cinAPI._manager.events.register_client_handler(client_name, "message", handler)
+    client = _QueuedClient(client_name, event_workers=workers)
+
+    async def run():
+        for message in messages:
+            await client._on_internal_message(message)
+        while client.event_queue_depth():
+            await asyncio.sleep(0.01)
+        client._stop_event_workers()
+
+    asyncio.run(run())
+
+
+def test_slow_channel_does_not_delay_another_channel_in_its_shard():
+    finished = {}
+    start = time.perf_counter()
+
+    async def handler(message):
+        if message.channel.id == 1:
+            await asyncio.sleep(0.5)
+        finished[message.content] = time.perf_counter() - start
+
+    _run_with_handler(handler, [_Message(1, "slow"), _Message(2, "fast")])
+    assert finished["fast"] < 0.25
+    assert finished["slow"] >= 0.5
+
+
+def test_one_channel_keeps_its_order():
+    seen = []
+
+    async def handler(message):
+        await asyncio.sleep(0.05 if message.content == "first" else 0)
+        seen.append(message.content)
+
+    _run_with_handler(handler, [_Message(1, "first"), _Message(1, "second"), _Message(1, "third")])
+    assert seen == ["first", "second", "third"]
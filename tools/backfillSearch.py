@@ -0,0 +1,89 @@
+# tools/backfillSearch.py
+# indexes existing chat logs (active .jsonl logs, rotated .jsonl.gz segments, and the <channel>.html logs from
+# before json lines) into the search index, streaming.
+# safe to re-run, or to run while the bot is logging: messages already indexed are skipped.
+# run from the repo root: python -m tools.backfillSearch [log files...]   (no args: every log under logs/)
+#
+# legacy .html logs kept no ids, so a channel's guild and channel ids (and whichever author ids are known) come from
+# that channel's .jsonl log. an .html log whose channel hasn't logged anything since the upgrade is skipped; re-run
+# once it has
+import os
+import sys
+from collections import Counter
+
+import cinLogging
+from cinSearch import searchIndex
+
+BATCH_SIZE = 1000
+UNKNOWN_AUTHOR_ID = 0
+
+
+def isLegacyHtml(path: str) -> bool:
+    return path.endswith(".html") and not path.endswith(cinLogging.RENDERED_HTML_SUFFIX)
+
+
+def legacyRecords(htmlPath: str):
+    """a legacy html log's records with ids filled in from its channel's json lines log, or None if there are none"""
+    logPath = htmlPath[:-len(".html")] + ".jsonl"
+    ids = None
+    authorIDs = {}
+    for record in cinLogging.readChannelRecords(logPath):
+        ids = {key: record.get(key) for key in ("guild_id", "channel_id", "channel")}
+        authorIDs.setdefault(record.get("author"), record.get("author_id"))
+    if ids is None or ids["channel_id"] is None:
+        return None
+
+    def records():
+        perSecond = Counter()
+        for record in cinLogging.readLegacyHtmlRecords(htmlPath):
+            # whole-second times: spread messages sharing a second so (channel, time, author) stays unique,
+            # the same way on every run
+            second = record["time"]
+            record["time"] = second + perSecond[second] / 1000
+            perSecond[second] += 1
+            record["author_id"] = authorIDs.get(record["author"], UNKNOWN_AUTHOR_ID)
+            yield record | ids
+
+    return records()
+
+
+def main(args):
+    logPaths = args
+    if not logPaths:
+        for root, _, files in os.walk(cinLogging.logsPath):
+            logPaths.extend(
+                os.path.join(root, name) for name in files
+                if name.endswith((".jsonl", ".jsonl.gz")) or isLegacyHtml(name)
+            )
+
+    cinLogging.logWriter.flush()
+    connection = searchIndex.connect()
+    total = added = skipped = 0
+    for logPath in sorted(logPaths):
+        if isLegacyHtml(logPath):
+            records = legacyRecords(logPath)
+            if records is None:
+                skipped += 1
+                print(f"  {logPath} (skipped: no json lines log for this channel yet)")
+                continue
+        else:
+            records = cinLogging.readLogRecords(logPath)
+
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= BATCH_SIZE:
+                added += searchIndex.indexRecords(connection, batch)
+                total += len(batch)
+                batch = []
+        added += searchIndex.indexRecords(connection, batch)
+        total += len(batch)
+        print(f"  {logPath}")
+
+    connection.close()
+    print(f"read {total} messages from {len(logPaths) - skipped} logs, {added} newly indexed"
+          + (f", {skipped} legacy logs skipped" if skipped else ""))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,21 @@
+# tools/migrateCaches.py
+# imports the json caches under cache/ into the sqlite storage backend.
+# run from the repo root: python -m tools.migrateCaches [--overwrite] [cache file names...]
+# afterwards, set storage.backend to sqlite in configs/config.yaml
+import sys
+
+import cinIO
+
+
+def main(args):
+    overwrite = "--overwrite" in args
+    fileNames = [arg for arg in args if not arg.startswith("--")] or None
+
+    imported = cinIO.migrateJsonCachesToSqlite(fileNames, overwrite=overwrite)
+    for namespace, count in imported.items():
+        print(f"  {namespace}: {count} entries")
+    print(f"migrated {len(imported)} caches into {cinIO.config.get('storage', {}).get('sqlitePath', 'cinnamon.db')}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
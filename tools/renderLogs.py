@@ -0,0 +1,28 @@
+# tools/renderLogs.py
+# renders json lines chat logs (rotated segments included) back into the defaultLoggingHTML view, next to each log.
+# run from the repo root: python -m tools.renderLogs [log files...]   (no args: every log under logs/)
+import os
+import sys
+
+import cinLogging
+
+
+def main(args):
+    logPaths = set(args)
+    if not logPaths:
+        # a channel has an active .jsonl, rotated segments listed in its .index.json, or both
+        for root, _, files in os.walk(cinLogging.logsPath):
+            for name in files:
+                if name.endswith(".jsonl"):
+                    logPaths.add(os.path.join(root, name))
+                elif name.endswith(".index.json"):
+                    logPaths.add(os.path.join(root, name[:-len(".index.json")] + ".jsonl"))
+
+    cinLogging.logWriter.flush()
+    for logPath in sorted(logPaths):
+        print(f"  {cinLogging.renderLogToHtml(logPath)}")
+    print(f"rendered {len(logPaths)} logs")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])